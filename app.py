@@ -1,17 +1,35 @@
 import os
+import time
+import functools
 import logging
 from datetime import datetime
+from collections import Counter
 import pandas as pd
-from flask import Flask, render_template, request, jsonify
+import click
+from flask import Flask, Response, render_template, stream_template, make_response, request, jsonify, url_for
 from flask_sqlalchemy import SQLAlchemy
 from flask_migrate import Migrate
 from config import Config
 from dotenv import load_dotenv
-from sqlalchemy.dialects.postgresql import UUID, JSONB, ENUM as PG_ENUM
+from sqlalchemy.dialects.postgresql import UUID, JSONB
 from sqlalchemy.types import TypeDecorator, String
+from sqlalchemy.orm import Session
 import uuid
 import json
 from slugify import slugify
+from jinja2 import FileSystemBytecodeCache
+from fragment_cache import FragmentCache, make_fragment_helpers
+from markers import (TILE_CLUSTERS_SQL, TileCache, parse_marker_request, cached_tile_markers,
+                     store_tile_markers, tile_query_params)
+from suggest import RefreshingSuggestIndex
+from neighbors import related_venues
+from ranking import bayesian_score, REVIEW_STARS
+from dedup import resolve_identities, assign_slugs, merge_records, split_by_anchor
+from compression import CompressedCache, compress_response
+from streaming import ReplayableRows, buffered
+from profiling import Profile, ProfilingMiddleware, install_sql_timing, make_token, is_profiled
+from partitions import (ensure_state_partition, ensure_states, is_state_code, create_staging_partition,
+                        swap_in_staging_partition, load_state_codes, to_state_code)
 
 # Load environment variables
 load_dotenv()
@@ -40,13 +58,31 @@ except Exception as e:
     raise
 
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
-app.config['TEMPLATES_AUTO_RELOAD'] = True
+
+# Compiled templates are reused across worker starts (must be set before jinja_env is created)
+os.makedirs(app.config['JINJA_BYTECODE_CACHE_DIR'], exist_ok=True)
+app.jinja_options = {**app.jinja_options,
+                     'bytecode_cache': FileSystemBytecodeCache(app.config['JINJA_BYTECODE_CACHE_DIR'])}
+fragment_cache = FragmentCache(app.config['FRAGMENT_CACHE_SIZE'])
+app.jinja_env.globals.update(make_fragment_helpers(fragment_cache, app.jinja_env))
+marker_cache = TileCache(ttl_seconds=app.config['MARKER_CACHE_TTL_SECONDS'])
+compressed_cache = CompressedCache(app.config['COMPRESS_CACHE_MAX_BYTES'])
 
 # Initialize extensions
 db = SQLAlchemy(app)
 migrate = Migrate(app, db)
 logger.info("Database extensions initialized successfully")
 
+# Opt-in request profiling (see profiling.py); nothing is installed unless enabled
+if app.config['PROFILING_ENABLED']:
+    if app.config['SECRET_KEY'] == 'dev' and not app.debug:
+        logger.error("PROFILING_ENABLED needs a real SECRET_KEY; request profiling is off")
+    else:
+        app.wsgi_app = ProfilingMiddleware(app.wsgi_app, app.config['SECRET_KEY'], app.config['PROFILE_DIR'],
+                                           token_max_age=app.config['PROFILE_TOKEN_MAX_AGE'],
+                                           sample_interval=app.config['PROFILE_SAMPLE_INTERVAL'])
+        logger.info(f"Request profiling enabled, writing profiles to {app.config['PROFILE_DIR']}")
+
 @app.route('/health')
 def health_check():
     try:
@@ -57,6 +93,33 @@ def health_check():
         logger.error(f"Health check failed: {str(e)}")
         return jsonify({"status": "unhealthy", "error": str(e)}), 500
 
+@app.after_request
+def compress(response):
+    return compress_response(response, request, compressed_cache, app.config['COMPRESS_MIN_SIZE'])
+
+def cacheable_page(view):
+    """
+    Mark a page's successful responses publicly cacheable (and compressed once, see compression.py).
+
+    Profiled requests are left uncacheable, so they skip the compressed cache too.
+    """
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        response = make_response(view(*args, **kwargs))
+        if response.status_code == 200 and not is_profiled(request.environ):
+            response.cache_control.public = True
+            response.cache_control.max_age = app.config['PAGE_CACHE_MAX_AGE']
+        return response
+    return wrapper
+
+def stream_page(template_name, **context):
+    """Render a template as a streamed response, sent in chunks of a few KB."""
+    return Response(buffered(stream_template(template_name, **context)), mimetype='text/html')
+
+def streamed_rows(query):
+    """Rows of a query fetched in batches from a server-side cursor, loopable more than once."""
+    return ReplayableRows(db.session.scalars(query.execution_options(yield_per=app.config['STREAM_YIELD_PER'])))
+
 # Error handlers
 @app.errorhandler(500)
 def internal_error(error):
@@ -86,27 +149,54 @@ class POINT(TypeDecorator):
         coords = value.strip('()').split(',')
         return {'latitude': float(coords[0]), 'longitude': float(coords[1])}
 
+class State(db.Model):
+    __tablename__ = 'states'
+
+    code = db.Column(db.String(2), primary_key=True)
+    name = db.Column(db.Text, nullable=False)
+    country = db.Column(db.String(2), nullable=False, server_default='US')
+
 class Location(db.Model):
     __tablename__ = 'locations'
+    # LIST-partitioned by state (see partitions.py); Postgres requires the
+    # partition key in every unique constraint, hence (id, state) and (slug, state).
+    # Global slug uniqueness is enforced by location_slugs (LocationSlug)
+    __table_args__ = (
+        db.UniqueConstraint('slug', 'state', name='locations_slug_state_key'),
+        {'postgresql_partition_by': 'LIST (state)'}
+    )
     
     id = db.Column(UUID(as_uuid=True), primary_key=True, server_default=db.text('gen_random_uuid()'))
     business_name = db.Column(db.Text, nullable=False)
     address = db.Column(db.Text, nullable=False)
     city = db.Column(db.Text, nullable=False)
-    state = db.Column(PG_ENUM('OR', 'WA', 'CA', 'ID', name='state_code'), nullable=False)
+    state = db.Column(db.String(2), db.ForeignKey('states.code'), primary_key=True)
     zip_code = db.Column(db.String(10), nullable=False)
     phone = db.Column(db.String(20))
     website = db.Column(db.Text)
     description = db.Column(db.Text)
     hours = db.Column(JSONB)
-    slug = db.Column(db.Text, nullable=False, unique=True)
+    slug = db.Column(db.Text, nullable=False)
     created_at = db.Column(db.TIMESTAMP(timezone=True), nullable=False, server_default=db.text('CURRENT_TIMESTAMP'))
     updated_at = db.Column(db.TIMESTAMP(timezone=True), nullable=False, server_default=db.text('CURRENT_TIMESTAMP'))
     rating = db.Column(db.Numeric(3,2))
     reviews_count = db.Column(db.Integer)
     reviews_link = db.Column(db.Text)
+    reviews_per_score_1 = db.Column(db.Integer)
+    reviews_per_score_2 = db.Column(db.Integer)
+    reviews_per_score_3 = db.Column(db.Integer)
+    reviews_per_score_4 = db.Column(db.Integer)
+    reviews_per_score_5 = db.Column(db.Integer)
+    # Bayesian average of the reviews, maintained at ingest (see ranking.py)
+    score = db.Column(db.Float, nullable=False, server_default=db.text('0'))
     location = db.Column(POINT)
     location_metadata = db.Column(JSONB)
+    # Numeric copies of the "(lat,lon)" string, kept in sync by Postgres and indexed for map lookups
+    latitude = db.Column(db.Float, db.Computed("split_part(btrim(location, '()'), ',', 1)::double precision", persisted=True))
+    longitude = db.Column(db.Float, db.Computed("split_part(btrim(location, '()'), ',', 2)::double precision", persisted=True))
+
+    # ids are unique on their own, so rows are still identified (and fetched) by id alone
+    __mapper_args__ = {'primary_key': [id]}
 
     def to_dict(self):
         return {
@@ -126,14 +216,103 @@ class Location(db.Model):
             'rating': float(self.rating) if self.rating else None,
             'reviews_count': self.reviews_count,
             'reviews_link': self.reviews_link,
+            'score': self.score,
             'location': self.location,
             'location_metadata': self.location_metadata
         }
 
+class LocationSlug(db.Model):
+    __tablename__ = 'location_slugs'
+
+    # Slugs are unique across every state, which locations (partitioned by state)
+    # can't enforce. This registry holds each slug once, with the state whose
+    # partition has it, so a slug lookup reads a single partition. Sync keeps it
+    # up to date row by row; imports and snapshot loads rebuild a state's rows
+    # when its partition is swapped in (see partitions.py).
+    slug = db.Column(db.Text, primary_key=True)
+    state = db.Column(db.String(2), db.ForeignKey('states.code'), nullable=False)
+
+class LocationNeighbor(db.Model):
+    __tablename__ = 'location_neighbors'
+
+    # No foreign keys: locations ids are only unique together with the partition key.
+    # The table is rebuilt by compute_location_neighbors after every import and sync.
+    location_id = db.Column(UUID(as_uuid=True), primary_key=True)
+    rank = db.Column(db.SmallInteger, primary_key=True)
+    neighbor_id = db.Column(UUID(as_uuid=True), nullable=False)
+    # Lets the join to locations read only the neighbor's partition
+    neighbor_state = db.Column(db.String(2), nullable=False)
+    distance_km = db.Column(db.Float, nullable=False)
+    subtype_similarity = db.Column(db.Float, nullable=False)
+
+class SyncRun(db.Model):
+    __tablename__ = 'sync_runs'
+
+    id = db.Column(db.Integer, primary_key=True)
+    started_at = db.Column(db.TIMESTAMP(timezone=True), nullable=False, server_default=db.text('CURRENT_TIMESTAMP'))
+    finished_at = db.Column(db.TIMESTAMP(timezone=True))
+    status = db.Column(db.String(20), nullable=False, default='running')
+    rows_read = db.Column(db.Integer, nullable=False, default=0)
+    inserted = db.Column(db.Integer, nullable=False, default=0)
+    updated = db.Column(db.Integer, nullable=False, default=0)
+    errors = db.Column(db.Integer, nullable=False, default=0)
+    duration_seconds = db.Column(db.Float)
+    rows_per_second = db.Column(db.Float)
+    message = db.Column(db.Text)
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'started_at': self.started_at.isoformat() if self.started_at else None,
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None,
+            'status': self.status,
+            'rows_read': self.rows_read,
+            'inserted': self.inserted,
+            'updated': self.updated,
+            'errors': self.errors,
+            'duration_seconds': self.duration_seconds,
+            'rows_per_second': self.rows_per_second,
+            'message': self.message
+        }
+
+def ranked_locations_query(state=None, city=None, limit=None):
+    """
+    Locations ordered best first.
+
+    Filtering on state prunes to that state's partition, where city matches
+    idx_locations_city_score; no filter merges idx_locations_score across
+    partitions. Either way rows are read straight off an index. Equal scores
+    are ordered by id, so pages don't shuffle between requests.
+    """
+    query = db.select(Location).order_by(Location.score.desc(), Location.id)
+    if state:
+        query = query.where(Location.state == state)
+    if city:
+        query = query.where(db.func.lower(Location.city) == city.lower())
+    if limit:
+        query = query.limit(limit)
+    return query
+
+def parse_locations_args(args, max_limit):
+    """(state, city, limit) of a /api/locations request; raises ValueError on a bad state."""
+    state = args.get('state', '').upper() or None
+    city = args.get('city') or None
+    limit = min(max(1, args.get('limit', 50, type=int)), max_limit)
+    if state and not is_state_code(state):
+        raise ValueError(f"Invalid state: {state}")
+    return state, city, limit
+
+def compute_score(rating, reviews_count, per_score=None):
+    """Listing rank score with the configured prior."""
+    return bayesian_score(rating, reviews_count, per_score,
+                          prior_mean=app.config['RANKING_PRIOR_MEAN'],
+                          prior_weight=app.config['RANKING_PRIOR_WEIGHT'])
+
 @app.route('/')
+@cacheable_page
 def home():
     try:
-        locations = Location.query.all()
+        locations = db.session.scalars(ranked_locations_query(limit=app.config['FEATURED_LOCATIONS_COUNT'])).all()
         logger.info(f"Retrieved {len(locations)} locations for home page")
         return render_template('home.html', locations=locations)
     except Exception as e:
@@ -141,21 +320,57 @@ def home():
         return render_template('500.html'), 500
 
 @app.route('/location/<slug>')
+@cacheable_page
 def location_detail(slug):
     try:
-        location = Location.query.filter_by(slug=slug).first_or_404()
+        location = db.session.scalar(location_by_slug_query(slug))
+        if location is None:
+            return render_template('404.html'), 404
         logger.info(f"Retrieved location details for slug: {slug}")
-        return render_template('location_detail.html', location=location)
+        return render_template('location_detail.html', location=location,
+                               nearby=nearby_locations(location))
     except Exception as e:
         logger.error(f"Error in location_detail route for slug {slug}: {str(e)}")
         return render_template('500.html'), 500
 
+def search_locations_query(query):
+    """Ranked locations whose business name or city contains the lowercase query."""
+    return ranked_locations_query().where(db.or_(
+        db.func.lower(Location.business_name).contains(query, autoescape=True),
+        db.func.lower(Location.city).contains(query, autoescape=True)
+    ))
+
+def count_query(query):
+    return db.select(db.func.count()).select_from(query.order_by(None).subquery())
+
+def location_by_slug_query(slug):
+    """The location with a slug, read from the one partition location_slugs points at."""
+    state = db.select(LocationSlug.state).where(LocationSlug.slug == slug).scalar_subquery()
+    return db.select(Location).where(Location.slug == slug, Location.state == state)
+
+def nearby_locations_query(location_id, limit):
+    """Precomputed nearby venues of a location as (Location, distance_km) rows, best first."""
+    return (db.select(Location, LocationNeighbor.distance_km)
+            .join(LocationNeighbor, db.and_(LocationNeighbor.neighbor_id == Location.id,
+                                            LocationNeighbor.neighbor_state == Location.state))
+            .where(LocationNeighbor.location_id == location_id)
+            .order_by(LocationNeighbor.rank)
+            .limit(limit))
+
+def nearby_locations(location):
+    return db.session.execute(nearby_locations_query(location.id, app.config['NEARBY_DISPLAY_COUNT'])).all()
+
 @app.route('/search')
 def search():
     query = request.args.get('q', '').lower()
-    locations = Location.query.all()
-    filtered_locations = [loc for loc in locations if query in loc.business_name.lower() or query in loc.city.lower()]
-    return render_template('search_results.html', locations=filtered_locations, query=query)
+    locations_query = search_locations_query(query)
+    location_count = db.session.scalar(count_query(locations_query))
+    if location_count > app.config['STREAM_MIN_ROWS']:
+        return stream_page('search_results.html', locations=streamed_rows(locations_query),
+                           location_count=location_count, query=query)
+    locations = db.session.scalars(locations_query).all()
+    return render_template('search_results.html', locations=locations,
+                           location_count=location_count, query=query)
 
 def create_slug(business_name):
     # Convert to lowercase and replace spaces with hyphens
@@ -173,39 +388,92 @@ def create_city_slug(city, state):
     state_slug = ''.join(e for e in state_slug if e.isalnum() or e == '-')
     return f"{city_slug}-{state_slug}"
 
+def parse_city_slug(city_slug):
+    """Split a city slug like 'lake-oswego-or' into ('Lake Oswego', 'OR'), or None."""
+    # First split off the state code (last 2-3 characters after last hyphen)
+    parts = city_slug.rsplit('-', 1)
+    if len(parts) != 2:
+        return None
+
+    city_slug_part, state_code = parts
+
+    # Convert city slug back to display format
+    city_display = ' '.join(word.capitalize() for word in city_slug_part.split('-'))
+    return city_display, state_code.upper()
+
+def format_cities(cities):
+    """Attach slugs to (city, state, count) rows for the city list page."""
+    return [
+        {
+            'city': city,
+            'state': state,
+            'count': count,
+            'slug': create_city_slug(city, state)
+        }
+        for city, state, count in cities
+    ]
+
+def location_bounds(locations):
+    """Bounding box of the given locations for the initial map view, or None."""
+    coords = [loc.location for loc in locations if loc.location]
+    if not coords:
+        return None
+    return {
+        'south': min(c['latitude'] for c in coords),
+        'west': min(c['longitude'] for c in coords),
+        'north': max(c['latitude'] for c in coords),
+        'east': max(c['longitude'] for c in coords)
+    }
+
+def city_summary_query(state, city):
+    """Location count and bounding box of a city in one aggregate."""
+    return (db.select(db.func.count(),
+                      db.func.min(Location.latitude), db.func.min(Location.longitude),
+                      db.func.max(Location.latitude), db.func.max(Location.longitude))
+            .where(Location.state == state, db.func.lower(Location.city) == city.lower()))
+
 @app.route('/city/<city_slug>')
+@cacheable_page
 def city_detail(city_slug):
     # Split the slug into city and state
     try:
-        # First split off the state code (last 2-3 characters after last hyphen)
-        parts = city_slug.rsplit('-', 1)
-        if len(parts) != 2:
+        parsed = parse_city_slug(city_slug)
+        if not parsed:
             return render_template('404.html'), 404
-            
-        city_slug_part, state_code = parts
-        
-        # Convert city slug back to display format
-        city_display = ' '.join(word.capitalize() for word in city_slug_part.split('-'))
-        state_display = state_code.upper()
+
+        city_display, state_display = parsed
         
         # Query locations for this city
-        locations = Location.query.filter(
-            Location.city.ilike(city_display),
-            Location.state == state_display  # Changed from ilike to == for enum
-        ).all()
+        if not is_state_code(state_display):
+            return render_template('404.html'), 404
+        locations_query = ranked_locations_query(state=state_display, city=city_display)
+        location_count, south, west, north, east = db.session.execute(
+            city_summary_query(state_display, city_display)).one()
         
-        if not locations:
+        if not location_count:
             return render_template('404.html'), 404
+        
+        # Big cities stream their cards from a server-side cursor instead of loading every row first
+        map_bounds = {'south': south, 'west': west, 'north': north, 'east': east} if south is not None else None
+        if location_count > app.config['STREAM_MIN_ROWS']:
+            return stream_page('city_detail.html',
+                               locations=streamed_rows(locations_query),
+                               city_name=city_display,
+                               state_name=state_display,
+                               location_count=location_count,
+                               map_bounds=map_bounds)
             
         return render_template('city_detail.html',
-                             locations=locations,
+                             locations=db.session.scalars(locations_query).all(),
                              city_name=city_display,
                              state_name=state_display,
-                             location_count=len(locations))
+                             location_count=location_count,
+                             map_bounds=map_bounds)
     except ValueError:
         return render_template('404.html'), 404
 
 @app.route('/cities')
+@cacheable_page
 def city_list():
     # Get unique cities with their location counts
     cities = db.session.query(
@@ -215,22 +483,107 @@ def city_list():
     ).group_by(Location.city, Location.state).all()
     
     # Format cities with their slugs
-    formatted_cities = [
-        {
-            'city': city,
-            'state': state,
-            'count': count,
-            'slug': create_city_slug(city, state)
-        }
-        for city, state, count in cities
-    ]
+    formatted_cities = format_cities(cities)
     
     return render_template('city_list.html', cities=formatted_cities)
 
-def sync_with_google_sheet():
+@app.route('/api/locations')
+def locations_api():
+    """Top-ranked locations as JSON, optionally filtered by ?state=&city=, up to ?limit="""
+    try:
+        state, city, limit = parse_locations_args(request.args, app.config['API_MAX_LIMIT'])
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    try:
+        locations = db.session.scalars(ranked_locations_query(state=state, city=city, limit=limit)).all()
+        return jsonify({'locations': [location.to_dict() for location in locations]})
+    except Exception as e:
+        logger.error(f"Error in locations route: {str(e)}")
+        return jsonify({'error': 'Could not load locations'}), 500
+
+@app.route('/api/markers')
+def markers_api():
+    """Clustered map markers for ?bbox=west,south,east,north&zoom=z"""
+    try:
+        zoom, tiles = parse_marker_request(request.args, app.config['MARKER_MAX_TILES'])
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    try:
+        markers, missing = cached_tile_markers(marker_cache, zoom, tiles)
+        for x, y in missing:
+            rows = db.session.execute(TILE_CLUSTERS_SQL, tile_query_params(zoom, x, y)).all()
+            markers.extend(store_tile_markers(marker_cache, zoom, x, y, rows))
+    except Exception as e:
+        logger.error(f"Error in markers route: {str(e)}")
+        return jsonify({'error': 'Could not load markers'}), 500
+
+    response = jsonify({'zoom': zoom, 'markers': markers})
+    response.headers['Cache-Control'] = f"public, max-age={app.config['MARKER_CACHE_TTL_SECONDS']}"
+    return response
+
+def popularity(rating, reviews_count):
+    """Suggestion ranking weight: review volume scaled by rating."""
+    return (reviews_count or 0) * (float(rating) if rating else 1.0)
+
+def load_suggest_entries():
+    """(label, score, payload) entries for the suggest index: one per venue and one per city."""
+    with app.app_context():
+        rows = db.session.query(
+            Location.business_name, Location.city, Location.state,
+            Location.slug, Location.rating, Location.reviews_count
+        ).all()
+
+    entries = []
+    city_scores = {}
+    for name, city, state, slug, rating, reviews_count in rows:
+        score = popularity(rating, reviews_count)
+        entries.append((name, score, {'type': 'location', 'label': name, 'detail': f"{city}, {state}", 'slug': slug}))
+        city_scores[(city, state)] = city_scores.get((city, state), 0) + score + 1
+    for (city, state), score in city_scores.items():
+        label = f"{city}, {state}"
+        entries.append((label, score, {'type': 'city', 'label': label, 'slug': create_city_slug(city, state)}))
+    return entries
+
+def load_suggest_version():
+    with app.app_context():
+        return tuple(db.session.execute(db.text('SELECT count(*), max(updated_at) FROM locations')).one())
+
+suggest_index = RefreshingSuggestIndex(load_suggest_entries, load_suggest_version,
+                                       refresh_seconds=app.config['SUGGEST_REFRESH_SECONDS'])
+
+@app.route('/api/suggest')
+def suggest_api():
+    """Top venue and city suggestions for a search box prefix (?q=, optional &limit=)"""
+    query = request.args.get('q', '')
+    limit = request.args.get('limit', 8, type=int)
+    try:
+        results = suggest_index.search(query, max(1, limit))
+    except Exception as e:
+        logger.error(f"Error in suggest route: {str(e)}")
+        return jsonify({'error': 'Could not load suggestions'}), 500
+
+    suggestions = []
+    for result in results:
+        endpoint, kwargs = (('location_detail', {'slug': result['slug']}) if result['type'] == 'location'
+                            else ('city_detail', {'city_slug': result['slug']}))
+        suggestions.append({**result, 'url': url_for(endpoint, **kwargs)})
+    return jsonify({'query': query, 'suggestions': suggestions})
+
+def sync_with_google_sheet(session=None, stats=None, progress=None):
     """
     Sync database with Google Sheet data
+
+    session defaults to db.session; the background worker passes a session bound
+    to the connection holding the sync lock. stats, if given, is filled with the
+    run counters (and a 'message' when the sync fails), and progress(stats) is
+    called before every batch commit. Each row is written in its own SAVEPOINT,
+    so a failing row is rolled back alone and the counters only ever include
+    rows that were written.
     """
+    session = session or db.session
+    stats = stats if stats is not None else {}
     try:
         logger.info("Starting sync with Google Sheet")
         logger.info(f"Using sheet URL: {SHEET_URL}")
@@ -243,21 +596,23 @@ def sync_with_google_sheet():
             logger.info(f"First row sample: {df.iloc[0].to_dict()}")
         except Exception as e:
             logger.error(f"Error reading Google Sheet: {str(e)}")
+            stats['message'] = f"Could not read Google Sheet: {str(e)}"
             return False
+        stats['rows_read'] = len(df)
         
-        # Process each row
+        # Parse every row first so duplicates can be resolved across the whole sheet
         current_time = datetime.utcnow()
         updates = 0
         new_records = 0
+        merged = 0
         errors = 0
+        incoming = []
+        state_codes = load_state_codes(session.connection())
         
         for index, row in df.iterrows():
             try:
                 logger.debug(f"Processing row {index + 1}: {row['name']}")
                 
-                # Create slug for the business
-                business_slug = slugify(row['name'])
-                
                 # Parse hours
                 hours = None
                 if pd.notna(row.get('working_hours')):
@@ -284,10 +639,12 @@ def sync_with_google_sheet():
                     else:
                         logger.warning(f"Could not extract city from address for {row['name']}: {row['full_address']}")
                 
-                # Ensure state is properly formatted
+                # Map the state (code or full name) to a code from the states lookup
                 state = None
                 if pd.notna(row.get('state')):
-                    state = row['state'].upper()[:2]
+                    state = to_state_code(row['state'], state_codes)
+                    if state is None:
+                        raise ValueError(f"Unknown state {row['state']!r} (add it with `flask add-state`)")
                     logger.debug(f"Formatted state for {row['name']}: {state}")
                 
                 # Prepare location data
@@ -304,6 +661,9 @@ def sync_with_google_sheet():
                     'rating': float(row['rating']) if pd.notna(row.get('rating')) else None,
                     'reviews_count': int(row['reviews']) if pd.notna(row.get('reviews')) else None,
                     'reviews_link': str(row['reviews_link']) if pd.notna(row.get('reviews_link')) else None,
+                    **{f'reviews_per_score_{stars}': int(row[f'reviews_per_score_{stars}'])
+                       if pd.notna(row.get(f'reviews_per_score_{stars}')) else None
+                       for stars in REVIEW_STARS},
                     'location': location_point,
                     'location_metadata': {
                         'type': row['type'] if pd.notna(row.get('type')) else None,
@@ -315,56 +675,484 @@ def sync_with_google_sheet():
                     },
                     'updated_at': current_time
                 }
-                
-                # Check if location exists
-                location = Location.query.filter_by(slug=business_slug).first()
-                
-                if location:
-                    # Update existing location
-                    for key, value in location_data.items():
-                        setattr(location, key, value)
-                    updates += 1
-                    logger.info(f"Updated existing location: {row['name']}")
-                else:
-                    # Create new location
-                    location_data['slug'] = business_slug
-                    new_location = Location(**location_data)
-                    db.session.add(new_location)
-                    new_records += 1
-                    logger.info(f"Added new location: {row['name']}")
-                
-                # Commit every 10 records
-                if (updates + new_records) % 10 == 0:
-                    db.session.commit()
-                    logger.info(f"Committed batch. Updates: {updates}, New: {new_records}, Errors: {errors}")
+                location_data['score'] = compute_score(
+                    location_data['rating'], location_data['reviews_count'],
+                    [location_data[f'reviews_per_score_{stars}'] for stars in REVIEW_STARS]
+                )
+                incoming.append(location_data)
                 
             except Exception as e:
                 logger.error(f"Error processing row {index + 1} for {row.get('name', 'unknown')}: {str(e)}")
                 errors += 1
                 continue
         
+        # Match rows to stored venues by place_id/google_id, then by fuzzy name within zip/geohash blocks
+        existing = load_identity_records(session)
+        existing_states = {location_id: record['state'] for location_id, record in existing}
+        plan = plan_location_upserts(incoming, existing)
+        
+        committed = dict(updated=0, inserted=0, merged=0, errors=errors)
+        for location_id, location_data, duplicates in plan:
+            try:
+                with session.begin_nested():
+                    if location_id:
+                        # Update existing location, keeping its slug; the state picks its partition
+                        location = session.scalar(db.select(Location).where(
+                            Location.id == location_id, Location.state == existing_states[location_id]))
+                        for key, value in location_data.items():
+                            setattr(location, key, value)
+                        if location.state != existing_states[location_id]:
+                            session.merge(LocationSlug(slug=location.slug, state=location.state))
+                    else:
+                        # Create new location; a slug taken in another state fails this row alone
+                        session.add(LocationSlug(slug=location_data['slug'], state=location_data['state']))
+                        session.add(Location(**location_data))
+            except Exception as e:
+                # Only this row's SAVEPOINT is rolled back; earlier rows in the batch are kept
+                logger.error(f"Error saving {location_data.get('business_name', 'unknown')}: {str(e)}")
+                errors += 1
+                continue
+            
+            merged += duplicates
+            if location_id:
+                updates += 1
+                logger.info(f"Updated existing location: {location_data['business_name']}")
+            else:
+                new_records += 1
+                logger.info(f"Added new location: {location_data['business_name']} ({location_data['slug']})")
+            
+            # Commit every 10 records
+            if (updates + new_records) % 10 == 0:
+                stats.update(updated=updates, inserted=new_records, merged=merged, errors=errors)
+                if progress:
+                    progress(stats)
+                try:
+                    session.commit()
+                except Exception:
+                    # Report what was actually written before the failed batch
+                    stats.update(committed)
+                    raise
+                committed = dict(updated=updates, inserted=new_records, merged=merged, errors=errors)
+                logger.info(f"Committed batch. Updates: {updates}, New: {new_records}, Errors: {errors}")
+        
         # Final commit
+        stats.update(updated=updates, inserted=new_records, merged=merged, errors=errors)
         try:
-            db.session.commit()
-            logger.info(f"Sync completed. Updated: {updates}, New: {new_records}, Errors: {errors}")
+            session.commit()
+            logger.info(f"Sync completed. Updated: {updates}, New: {new_records}, Merged duplicates: {merged}, Errors: {errors}")
             return True
         except Exception as e:
             logger.error(f"Error during final commit: {str(e)}")
-            db.session.rollback()
+            session.rollback()
+            stats.update(committed)
+            stats['message'] = f"Final commit failed: {str(e)}"
             return False
         
     except Exception as e:
         logger.error(f"Error during sync: {str(e)}")
-        db.session.rollback()
+        session.rollback()
+        stats['message'] = str(e)
         return False
 
+def identity_record(location_data):
+    """The fields dedup.resolve_identities matches on, taken from a prepared location dict."""
+    metadata = location_data.get('location_metadata') or {}
+    latitude = longitude = None
+    if location_data.get('location'):
+        latitude, longitude = (float(c) for c in location_data['location'].strip('()').split(','))
+    return {
+        'name': location_data.get('business_name'),
+        'place_id': metadata.get('place_id'),
+        'google_id': metadata.get('google_id'),
+        'zip_code': location_data.get('zip_code'),
+        'latitude': latitude,
+        'longitude': longitude,
+        'city': location_data.get('city'),
+        'state': location_data.get('state'),
+        'slug': None
+    }
+
+def load_identity_records(session):
+    """Identity fields of every stored location, as (id, record) pairs."""
+    rows = session.query(
+        Location.id, Location.slug, Location.business_name, Location.city, Location.state,
+        Location.zip_code, Location.latitude, Location.longitude,
+        Location.location_metadata['place_id'].astext, Location.location_metadata['google_id'].astext
+    ).all()
+    return [
+        (location_id, {'name': name, 'slug': slug, 'city': city, 'state': state, 'zip_code': zip_code,
+                       'latitude': latitude, 'longitude': longitude,
+                       'place_id': place_id, 'google_id': google_id})
+        for location_id, slug, name, city, state, zip_code, latitude, longitude, place_id, google_id in rows
+    ]
+
+def plan_location_upserts(incoming, existing=()):
+    """
+    Resolve duplicate venues among incoming location dicts and stored rows.
+
+    existing holds (id, record) pairs from load_identity_records. Returns a list
+    of (existing_id, location_data, merged_count): duplicates are merged into
+    one location_data, existing_id is the stored row it updates (None for a
+    new venue, which gets a unique slug), and merged_count is how many
+    incoming rows were folded into it. A cluster holding several stored rows
+    is split between them, so no stored venue is ever merged away.
+    """
+    existing = list(existing)
+    records = [record for _, record in existing] + [identity_record(data) for data in incoming]
+    clusters = resolve_identities(records, name_threshold=app.config['DEDUP_NAME_THRESHOLD'])
+    slugs = assign_slugs(records, clusters)
+
+    plan = []
+    for cluster, members in clusters.items():
+        existing_members = [i for i in members if i < len(existing)]
+        if len(existing_members) > 1:
+            # Never fold several stored venues into one: each keeps its own id
+            logger.warning(f"Stored locations {[existing[i][0] for i in existing_members]} look like "
+                           f"the same venue; matching incoming rows to each separately")
+            groups = split_by_anchor(records, members, existing_members).values()
+        else:
+            groups = [members]
+        for group in groups:
+            rows = [incoming[i - len(existing)] for i in group if i >= len(existing)]
+            if not rows:
+                continue
+            existing_ids = [existing[i][0] for i in group if i < len(existing)]
+            location_data = merge_records(rows, prior_mean=app.config['RANKING_PRIOR_MEAN'],
+                                          prior_weight=app.config['RANKING_PRIOR_WEIGHT'])
+            if not existing_ids:
+                location_data['slug'] = slugs[cluster]
+            plan.append((existing_ids[0] if existing_ids else None, location_data, len(rows) - 1))
+    return plan
+
+def compute_location_neighbors(session=None):
+    """
+    Recompute the nearby and similar venues of every location.
+
+    Replaces location_neighbors in a single transaction, so detail pages keep
+    showing the previous results until the new ones are committed. The
+    whole-table rewrite runs under NEIGHBORS_STATEMENT_TIMEOUT_MS instead of
+    the sync's short statement_timeout; the setting ends with the transaction.
+    """
+    session = session or db.session
+    started = time.monotonic()
+    session.execute(db.text("SELECT set_config('statement_timeout', :timeout, true)"),
+                    {'timeout': str(app.config['NEIGHBORS_STATEMENT_TIMEOUT_MS'])})
+    rows = session.query(
+        Location.id, Location.state, Location.latitude, Location.longitude,
+        Location.location_metadata['subtypes']
+    ).filter(Location.latitude.isnot(None), Location.longitude.isnot(None)).all()
+
+    ids = [row[0] for row in rows]
+    states = [row[1] for row in rows]
+    related = related_venues([row[2] for row in rows], [row[3] for row in rows],
+                             [row[4] for row in rows], app.config['NEIGHBORS_PER_LOCATION'])
+    records = [
+        {'location_id': ids[i], 'rank': rank, 'neighbor_id': ids[neighbor], 'neighbor_state': states[neighbor],
+         'distance_km': distance, 'subtype_similarity': similarity}
+        for i, rank, neighbor, distance, similarity in related
+    ]
+
+    try:
+        session.execute(LocationNeighbor.__table__.delete())
+        for start in range(0, len(records), 5000):
+            session.execute(LocationNeighbor.__table__.insert(), records[start:start + 5000])
+        session.commit()
+    except Exception:
+        session.rollback()
+        raise
+    logger.info(f"Computed {len(records)} neighbors for {len(ids)} locations "
+                f"in {time.monotonic() - started:.1f}s")
+    return len(records)
+
+def _record_sync_stats(run, stats, started):
+    run.rows_read = stats.get('rows_read', 0)
+    run.inserted = stats.get('inserted', 0)
+    run.updated = stats.get('updated', 0)
+    run.errors = stats.get('errors', 0)
+    run.duration_seconds = time.monotonic() - started
+    processed = run.inserted + run.updated + run.errors
+    run.rows_per_second = processed / run.duration_seconds if run.duration_seconds > 0 else None
+
+# Whether any session holds the sync advisory lock (a bigint key is split into classid/objid)
+SYNC_LOCK_HELD_SQL = db.text("""
+    SELECT EXISTS (
+        SELECT 1 FROM pg_locks
+        WHERE locktype = 'advisory'
+          AND objsubid = 1
+          AND ((classid::bigint << 32) | objid::bigint) = :key
+    )
+""")
+
+def sync_status_payload(runs, lock_held):
+    """/api/sync/status body for the most recent SyncRun rows."""
+    return {
+        'syncing': bool(lock_held),
+        'interval_seconds': app.config['SYNC_INTERVAL_SECONDS'],
+        'runs': [run.to_dict() for run in runs]
+    }
+
+def run_locked_sync():
+    """
+    Run one Google Sheet sync while holding the sync advisory lock.
+
+    Everything happens on a single dedicated connection: the session-level
+    advisory lock and statement_timeout both survive the sync's batch commits,
+    and are released before the connection goes back to the pool. Returns the
+    recorded SyncRun, or None if another process is already syncing.
+    """
+    lock_key = app.config['SYNC_LOCK_KEY']
+    with db.engine.connect() as connection:
+        acquired = connection.execute(
+            db.text('SELECT pg_try_advisory_lock(:key)'), {'key': lock_key}
+        ).scalar()
+        connection.commit()
+        if not acquired:
+            logger.info("Sync skipped: another process holds the sync lock")
+            return None
+
+        try:
+            connection.execute(
+                db.text("SELECT set_config('statement_timeout', :timeout, false)"),
+                {'timeout': str(app.config['SYNC_STATEMENT_TIMEOUT_MS'])}
+            )
+            connection.commit()
+
+            session = Session(bind=connection, expire_on_commit=False)
+            # Holding the lock means no other sync is alive, so any run still
+            # marked running belongs to a process that died mid-sync
+            abandoned = session.execute(
+                db.update(SyncRun).where(SyncRun.status == 'running').values(
+                    status='abandoned', finished_at=datetime.utcnow(),
+                    message='Process exited before the run finished')
+            ).rowcount
+            if abandoned:
+                logger.warning(f"Marked {abandoned} interrupted sync run(s) as abandoned")
+            run = SyncRun(started_at=datetime.utcnow(), status='running')
+            session.add(run)
+            session.commit()
+
+            started = time.monotonic()
+            stats = {}
+
+            def report_progress(current):
+                _record_sync_stats(run, current, started)
+                logger.info(f"Sync progress: {run.inserted + run.updated + run.errors}/{run.rows_read} rows "
+                            f"({run.rows_per_second or 0:.1f} rows/sec)")
+
+            try:
+                succeeded = sync_with_google_sheet(session=session, stats=stats, progress=report_progress)
+                message = stats.get('message')
+            except Exception as e:
+                session.rollback()
+                succeeded = False
+                message = str(e)
+
+            if succeeded:
+                try:
+                    compute_location_neighbors(session)
+                except Exception as e:
+                    logger.error(f"Error computing location neighbors: {str(e)}")
+                    message = f"Neighbors not refreshed: {str(e)}"
+
+            _record_sync_stats(run, stats, started)
+            run.status = 'success' if succeeded else 'failed'
+            run.message = message
+            run.finished_at = datetime.utcnow()
+            session.add(run)
+            session.commit()
+            session.close()
+            logger.info(f"Sync run {run.id} finished with status {run.status} in {run.duration_seconds:.1f}s")
+            return run
+        finally:
+            connection.rollback()
+            connection.execute(db.text('RESET statement_timeout'))
+            connection.execute(db.text('SELECT pg_advisory_unlock(:key)'), {'key': lock_key})
+            connection.commit()
+
+@app.route('/api/sync/status')
+def sync_status():
+    try:
+        runs = SyncRun.query.order_by(SyncRun.started_at.desc()).limit(20).all()
+        lock_held = db.session.execute(SYNC_LOCK_HELD_SQL, {'key': app.config['SYNC_LOCK_KEY']}).scalar()
+        return jsonify(sync_status_payload(runs, lock_held)), 200
+    except Exception as e:
+        logger.error(f"Error in sync status route: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
 @app.cli.command("sync-sheet")
 def sync_sheet_command():
     """Sync database with Google Sheet data"""
-    if sync_with_google_sheet():
+    run = run_locked_sync()
+    if run is None:
+        print("Sync skipped: another sync is already running")
+    elif run.status == 'success':
         print("Sync completed successfully")
     else:
         print("Sync failed")
 
+@app.cli.command("compute-neighbors")
+def compute_neighbors_command():
+    """Recompute nearby and similar venues for every location"""
+    count = compute_location_neighbors()
+    print(f"Stored {count} neighbor rows")
+
+@app.cli.command("add-state")
+@click.argument('code')
+@click.argument('name')
+@click.option('--country', default='US', help='Two-letter country code.')
+def add_state_command(code, name, country):
+    """Add a state or province and create its locations partition"""
+    code = code.upper()
+    if not is_state_code(code):
+        print(f"Invalid state code: {code}")
+        return
+    db.session.merge(State(code=code, name=name, country=country.upper()))
+    ensure_state_partition(db.session.connection(), code)
+    db.session.commit()
+    print(f"Added {code} ({name})")
+
+@app.cli.command("export-snapshot")
+@click.argument('path')
+@click.option('--chunk-size', type=int, default=None, help='Rows per batch (defaults to SNAPSHOT_CHUNK_SIZE).')
+def export_snapshot_command(path, chunk_size):
+    """Write every location to a Parquet (or .arrow) snapshot file"""
+    # pyarrow is only needed by the snapshot commands, so web workers never import it
+    from snapshot import SnapshotWriter, snapshot_format, snapshot_row
+
+    chunk_size = chunk_size or app.config['SNAPSHOT_CHUNK_SIZE']
+    started = time.monotonic()
+    states = db.session.execute(db.select(State.code, State.name, State.country).order_by(State.code)).all()
+    # Streamed from a server-side cursor, sorted by state so loads can swap in one partition at a time
+    query = (db.select(*Location.__table__.c)
+             .order_by(Location.state, Location.id)
+             .execution_options(yield_per=chunk_size))
+    with SnapshotWriter(path, states=states, format=snapshot_format(path)) as writer:
+        for rows in db.session.execute(query).mappings().partitions():
+            writer.write([snapshot_row(row) for row in rows])
+            logger.info(f"Exported {writer.rows} locations")
+    print(f"Wrote {writer.rows} locations to {path} in {time.monotonic() - started:.1f}s")
+
+@app.cli.command("load-snapshot")
+@click.argument('path')
+@click.option('--chunk-size', type=int, default=None, help='Rows per batch (defaults to SNAPSHOT_CHUNK_SIZE).')
+def load_snapshot_command(path, chunk_size):
+    """Replace the locations of every state in a snapshot file with its rows"""
+    from snapshot import (open_snapshot, state_slices, batch_csv, CREATE_LOAD_TABLE_SQL, COPY_SQL,
+                          LOAD_TABLE, insert_from_load_table_sql)
+
+    chunk_size = chunk_size or app.config['SNAPSHOT_CHUNK_SIZE']
+    started = time.monotonic()
+    states, batches = open_snapshot(path, chunk_size)
+
+    # One connection throughout: the COPY target is a temporary table, which only it can see
+    loaded = 0
+    current_state = staging = None
+    finished_states = set()
+    with db.engine.connect() as connection:
+        ensure_states(connection, states)
+        connection.execute(db.text(CREATE_LOAD_TABLE_SQL))
+        connection.commit()
+
+        def finish_state():
+            # Rows go from the COPY table into the staging partition, which is then swapped in
+            connection.execute(db.text(insert_from_load_table_sql(staging)))
+            swap_in_staging_partition(connection, current_state)
+            connection.commit()
+            finished_states.add(current_state)
+            logger.info(f"Loaded {current_state}")
+
+        # Each state is loaded into a staging table and swapped in with its own commit
+        try:
+            for batch in batches:
+                for state, rows in state_slices(batch):
+                    if state != current_state:
+                        if current_state:
+                            finish_state()
+                        # From here on current_state is the state that is loading (and may fail)
+                        current_state = state
+                        if state in finished_states:
+                            raise ValueError(f"Snapshot rows are not grouped by state ({state} appears twice)")
+                        connection.execute(db.text(f"TRUNCATE {LOAD_TABLE}"))
+                        staging = create_staging_partition(connection, state)
+                    with connection.connection.cursor() as cursor:
+                        cursor.copy_expert(COPY_SQL, batch_csv(rows))
+                    loaded += rows.num_rows
+            if current_state:
+                finish_state()
+        except Exception as e:
+            connection.rollback()
+            logger.error(f"Error loading snapshot while loading {current_state}: {str(e)}")
+            done = ', '.join(sorted(finished_states)) or 'none'
+            print(f"Load failed at {current_state}; states already loaded: {done}. "
+                  f"Every other state kept its previous data")
+            return
+
+    print(f"Loaded {loaded} locations in {len(finished_states)} states from {path} "
+          f"in {time.monotonic() - started:.1f}s")
+    count = compute_location_neighbors()
+    print(f"Stored {count} neighbor rows")
+
+@app.cli.command("profile-token")
+def profile_token_command():
+    """Print a signed token that enables profiling of a request"""
+    print(make_token(app.config['SECRET_KEY']))
+    print(f"Valid for {app.config['PROFILE_TOKEN_MAX_AGE']}s. Send it as the X-Profile-Token header "
+          f"or the _profile query parameter; requires PROFILING_ENABLED.")
+
+@app.cli.command("profile-route")
+@click.argument('path')
+@click.option('--repeat', type=int, default=20, help='Number of profiled requests.')
+@click.option('--warmup', type=int, default=1, help='Unprofiled requests first, to fill caches.')
+@click.option('--top', type=int, default=25, help='Number of functions to print.')
+@click.option('--sort', type=click.Choice(['tottime', 'cumulative', 'calls']), default='tottime')
+@click.option('--save', is_flag=True, help='Also write .prof/.folded/.json files to PROFILE_DIR.')
+def profile_route_command(path, repeat, warmup, top, sort, save):
+    """Replay a route through the test client under the profiler and print its hotspots"""
+    install_sql_timing()
+    client = app.test_client()
+    for _ in range(warmup):
+        client.get(path).close()
+
+    statuses = Counter()
+    with Profile(app.config['PROFILE_SAMPLE_INTERVAL']) as profile:
+        for _ in range(repeat):
+            response = client.get(path)
+            # Streamed pages render while the body is read
+            response.get_data()
+            response.close()
+            statuses[response.status_code] += 1
+
+    elapsed_ms = profile.elapsed * 1000
+    print(f"{path}: {repeat} requests in {elapsed_ms:.1f} ms ({elapsed_ms / max(repeat, 1):.2f} ms/request), "
+          f"status {', '.join(f'{code} x{count}' for code, count in sorted(statuses.items()))}")
+    print(f"SQL: {len(profile.sql)} statements, {profile.sql_ms:.1f} ms "
+          f"({profile.sql_ms / elapsed_ms * 100 if elapsed_ms else 0:.0f}% of the time)")
+    for entry in profile.sql_summary()[:10]:
+        statement = ' '.join(entry['statement'].split())
+        print(f"  {entry['count']:>6}x {entry['total_ms']:>9.1f} ms  {statement[:100]}")
+
+    print(f"\n{'calls':>9} {'tottime ms':>11} {'cumtime ms':>11}  function")
+    for row in profile.top_functions(top, sort):
+        print(f"{row['calls']:>9} {row['tottime_ms']:>11.1f} {row['cumtime_ms']:>11.1f}  {row['function']}")
+
+    if save:
+        name = f"{datetime.utcnow().strftime('%Y%m%dT%H%M%S')}-replay-{slugify(path) or 'root'}"
+        base = profile.save(app.config['PROFILE_DIR'], name, path=path, repeat=repeat,
+                            statuses=dict(statuses))
+        print(f"\nSaved {base}.prof, {base}.folded and {base}.json")
+
+@app.cli.command("sync-worker")
+@click.option('--interval', type=int, default=None, help='Seconds between syncs (defaults to SYNC_INTERVAL_SECONDS).')
+def sync_worker_command(interval):
+    """Run the Google Sheet sync on a fixed interval"""
+    interval = interval or app.config['SYNC_INTERVAL_SECONDS']
+    logger.info(f"Starting sync worker with {interval}s interval")
+    while True:
+        try:
+            run_locked_sync()
+        except Exception as e:
+            logger.error(f"Sync worker run failed: {str(e)}")
+        time.sleep(interval)
+
 if __name__ == '__main__':
     app.run(debug=True) 
\ No newline at end of file
@@ -0,0 +1,222 @@
+"""
+Async ASGI entry point for the read-only directory pages.
+
+Serves the same routes and templates as app.py on Quart, with queries going
+through a SQLAlchemy async engine on asyncpg. A single process can hold
+hundreds of concurrent (slow) clients without running out of threads:
+
+    hypercorn asgi:asgi_app --bind 0.0.0.0:$PORT
+
+Writes, CLI commands and migrations stay on the Flask app.
+"""
+import os
+import asyncio
+import logging
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+from quart import Quart, render_template, request, jsonify, url_for
+from sqlalchemy import select, func, text
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+from jinja2 import FileSystemBytecodeCache
+from config import Config
+from fragment_cache import FragmentCache, make_async_fragment_helpers
+from markers import (TILE_CLUSTERS_SQL, TileCache, parse_marker_request, cached_tile_markers,
+                     store_tile_markers, tile_query_params)
+from partitions import is_state_code
+from app import (database_url, Location, SyncRun, parse_city_slug, format_cities,
+                 search_locations_query, location_bounds, suggest_index,
+                 location_by_slug_query, nearby_locations_query, ranked_locations_query,
+                 parse_locations_args, SYNC_LOCK_HELD_SQL, sync_status_payload)
+
+logger = logging.getLogger(__name__)
+
+asgi_app = Quart(__name__)
+asgi_app.config.from_object(Config)
+
+# Quart compiles templates in async mode, so keep its bytecode apart from the Flask app's
+bytecode_cache_dir = os.path.join(asgi_app.config['JINJA_BYTECODE_CACHE_DIR'], 'asgi')
+os.makedirs(bytecode_cache_dir, exist_ok=True)
+asgi_app.jinja_options = {**asgi_app.jinja_options,
+                          'bytecode_cache': FileSystemBytecodeCache(bytecode_cache_dir)}
+fragment_cache = FragmentCache(asgi_app.config['FRAGMENT_CACHE_SIZE'])
+asgi_app.jinja_env.globals.update(make_async_fragment_helpers(fragment_cache, asgi_app.jinja_env))
+marker_cache = TileCache(ttl_seconds=asgi_app.config['MARKER_CACHE_TTL_SECONDS'])
+
+
+def make_async_url(url):
+    """Point a postgresql:// URL at asyncpg, translating libpq's sslmode."""
+    scheme, netloc, path, query, fragment = urlsplit(url)
+    params = [('ssl', value) if key == 'sslmode' else (key, value)
+              for key, value in parse_qsl(query)]
+    return urlunsplit(('postgresql+asyncpg', netloc, path, urlencode(params), fragment))
+
+
+async_engine = create_async_engine(
+    make_async_url(database_url),
+    pool_size=int(os.getenv('ASYNC_POOL_SIZE', '20')),
+    max_overflow=int(os.getenv('ASYNC_MAX_OVERFLOW', '10')),
+    pool_pre_ping=True
+)
+async_session = async_sessionmaker(async_engine, expire_on_commit=False)
+logger.info("Async database engine initialized")
+
+
+@asgi_app.before_serving
+async def build_suggest_index():
+    # The suggest index loads through the Flask app's synchronous session, so build it off the event loop
+    await asyncio.to_thread(suggest_index.warm)
+
+
+@asgi_app.route('/health')
+async def health_check():
+    try:
+        async with async_engine.connect() as connection:
+            await connection.execute(text('SELECT 1'))
+        return jsonify({"status": "healthy", "database": "connected"}), 200
+    except Exception as e:
+        logger.error(f"Health check failed: {str(e)}")
+        return jsonify({"status": "unhealthy", "error": str(e)}), 500
+
+# Error handlers
+@asgi_app.errorhandler(500)
+async def internal_error(error):
+    logger.error(f"500 error occurred: {str(error)}")
+    return await render_template('500.html'), 500
+
+@asgi_app.errorhandler(404)
+async def not_found_error(error):
+    return await render_template('404.html'), 404
+
+
+@asgi_app.route('/')
+async def home():
+    try:
+        async with async_session() as session:
+            locations = (await session.scalars(
+                ranked_locations_query(limit=asgi_app.config['FEATURED_LOCATIONS_COUNT'])
+            )).all()
+        logger.info(f"Retrieved {len(locations)} locations for home page")
+        return await render_template('home.html', locations=locations)
+    except Exception as e:
+        logger.error(f"Error in home route: {str(e)}")
+        return await render_template('500.html'), 500
+
+@asgi_app.route('/location/<slug>')
+async def location_detail(slug):
+    try:
+        async with async_session() as session:
+            location = await session.scalar(location_by_slug_query(slug))
+            if location is None:
+                return await render_template('404.html'), 404
+            nearby = (await session.execute(
+                nearby_locations_query(location.id, asgi_app.config['NEARBY_DISPLAY_COUNT'])
+            )).all()
+        logger.info(f"Retrieved location details for slug: {slug}")
+        return await render_template('location_detail.html', location=location, nearby=nearby)
+    except Exception as e:
+        logger.error(f"Error in location_detail route for slug {slug}: {str(e)}")
+        return await render_template('500.html'), 500
+
+@asgi_app.route('/search')
+async def search():
+    query = request.args.get('q', '').lower()
+    async with async_session() as session:
+        locations = (await session.scalars(search_locations_query(query))).all()
+    return await render_template('search_results.html', locations=locations,
+                                 location_count=len(locations), query=query)
+
+@asgi_app.route('/city/<city_slug>')
+async def city_detail(city_slug):
+    parsed = parse_city_slug(city_slug)
+    if not parsed:
+        return await render_template('404.html'), 404
+
+    city_display, state_display = parsed
+    if not is_state_code(state_display):
+        return await render_template('404.html'), 404
+    async with async_session() as session:
+        locations = (await session.scalars(
+            ranked_locations_query(state=state_display, city=city_display)
+        )).all()
+
+    if not locations:
+        return await render_template('404.html'), 404
+
+    return await render_template('city_detail.html',
+                                 locations=locations,
+                                 city_name=city_display,
+                                 state_name=state_display,
+                                 location_count=len(locations),
+                                 map_bounds=location_bounds(locations))
+
+@asgi_app.route('/cities')
+async def city_list():
+    async with async_session() as session:
+        cities = (await session.execute(
+            select(Location.city, Location.state, func.count(Location.id).label('location_count'))
+            .group_by(Location.city, Location.state)
+        )).all()
+
+    return await render_template('city_list.html', cities=format_cities(cities))
+
+@asgi_app.route('/api/locations')
+async def locations_api():
+    try:
+        state, city, limit = parse_locations_args(request.args, asgi_app.config['API_MAX_LIMIT'])
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    try:
+        async with async_session() as session:
+            locations = (await session.scalars(ranked_locations_query(state=state, city=city, limit=limit))).all()
+        return jsonify({'locations': [location.to_dict() for location in locations]})
+    except Exception as e:
+        logger.error(f"Error in locations route: {str(e)}")
+        return jsonify({'error': 'Could not load locations'}), 500
+
+@asgi_app.route('/api/sync/status')
+async def sync_status():
+    try:
+        async with async_session() as session:
+            runs = (await session.scalars(
+                select(SyncRun).order_by(SyncRun.started_at.desc()).limit(20)
+            )).all()
+            lock_held = await session.scalar(SYNC_LOCK_HELD_SQL, {'key': asgi_app.config['SYNC_LOCK_KEY']})
+        return jsonify(sync_status_payload(runs, lock_held)), 200
+    except Exception as e:
+        logger.error(f"Error in sync status route: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
+@asgi_app.route('/api/markers')
+async def markers_api():
+    try:
+        zoom, tiles = parse_marker_request(request.args, asgi_app.config['MARKER_MAX_TILES'])
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    markers, missing = cached_tile_markers(marker_cache, zoom, tiles)
+    if missing:
+        async with async_engine.connect() as connection:
+            for x, y in missing:
+                rows = (await connection.execute(TILE_CLUSTERS_SQL, tile_query_params(zoom, x, y))).all()
+                markers.extend(store_tile_markers(marker_cache, zoom, x, y, rows))
+
+    response = jsonify({'zoom': zoom, 'markers': markers})
+    response.headers['Cache-Control'] = f"public, max-age={asgi_app.config['MARKER_CACHE_TTL_SECONDS']}"
+    return response
+
+@asgi_app.route('/api/suggest')
+async def suggest_api():
+    query = request.args.get('q', '')
+    limit = request.args.get('limit', 8, type=int)
+    try:
+        results = suggest_index.search(query, max(1, limit))
+    except Exception as e:
+        logger.error(f"Error in suggest route: {str(e)}")
+        return jsonify({'error': 'Could not load suggestions'}), 500
+
+    suggestions = []
+    for result in results:
+        endpoint, kwargs = (('location_detail', {'slug': result['slug']}) if result['type'] == 'location'
+                            else ('city_detail', {'city_slug': result['slug']}))
+        suggestions.append({**result, 'url': url_for(endpoint, **kwargs)})
+    return jsonify({'query': query, 'suggestions': suggestions})
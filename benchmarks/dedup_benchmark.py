@@ -0,0 +1,121 @@
+"""
+Scaling benchmark for the ingestion identity stage (dedup.py).
+
+Generates synthetic venues where a share of rows are duplicates: re-listed
+with the same place_id, or with a slightly different name and no Google ids.
+Some venues have no Google ids at all, and franchises share a name across
+cities (and sometimes a zip code). The script times resolve_identities +
+assign_slugs at growing sizes and reports:
+
+- us/row: microseconds per row for the whole stage;
+- base us/row: a pass that only geohashes every row, which does fixed work
+  per row, so its growth is memory and GC overhead, not the algorithm;
+- cmp/row: name comparisons per row, at most 2 x window (zip and geohash
+  block), and capped: blocks that hit max_block_comparisons;
+- pairwise precision and recall against the planted duplicates.
+
+The zip space is fixed, so blocks fill up and cmp/row rises with size until
+it nears its bound; us/row follows it.
+
+    python benchmarks/dedup_benchmark.py --sizes 100000 250000 500000 1000000
+"""
+import os
+import sys
+import time
+import random
+import argparse
+from collections import Counter
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from dedup import resolve_identities, assign_slugs, geohash  # noqa: E402
+
+WORDS = ['golf', 'indoor', 'swing', 'tee', 'links', 'club', 'fairway', 'birdie', 'eagle', 'par',
+         'bogey', 'green', 'simulator', 'lounge', 'studio', 'range', 'summit', 'valley', 'urban',
+         'sports', 'pacific', 'river', 'north', 'south', 'harbor', 'pines', 'oak', 'cedar']
+FRANCHISES = ['Topgolf', 'X-Golf', 'Five Iron Golf', 'GolfTEC', 'Drive Shack']
+
+
+def typo(name, rng):
+    variants = [
+        lambda n: n.replace("'", ''),
+        lambda n: n.upper(),
+        lambda n: n + ' LLC',
+        lambda n: n.replace(' ', '', 1),
+        lambda n: n[:-1] if len(n) > 6 else n,
+    ]
+    return rng.choice(variants)(name)
+
+
+def synthetic_records(count, rng):
+    """Records with an 'entity' label (the same for a venue and its planted duplicates)."""
+    records = []
+    cities = [f"City{i}" for i in range(max(10, count // 25))]
+    while len(records) < count:
+        entity = len(records)
+        zip_code = f"{rng.randint(10000, 99999)}"
+        latitude, longitude = rng.uniform(25, 49), rng.uniform(-125, -67)
+        if rng.random() < 0.02:
+            name = rng.choice(FRANCHISES)
+        else:
+            name = ' '.join(w.title() for w in rng.sample(WORDS, 3)) + f" {rng.randint(1, 999)}"
+        has_ids = rng.random() >= 0.1
+        record = {
+            'entity': entity, 'name': name, 'zip_code': zip_code, 'latitude': latitude, 'longitude': longitude,
+            'place_id': f"place-{entity}" if has_ids else None, 'google_id': f"gid-{entity}" if has_ids else None,
+            'city': rng.choice(cities), 'state': 'OR', 'slug': None,
+        }
+        records.append(record)
+        roll = rng.random()
+        if roll < 0.03:
+            records.append(dict(record))
+        elif roll < 0.06:
+            records.append(dict(record, name=typo(name, rng), place_id=None, google_id=None,
+                                latitude=latitude + rng.uniform(-0.0003, 0.0003)))
+    return records[:count]
+
+
+def pairs(sizes):
+    return sum(size * (size - 1) // 2 for size in sizes)
+
+
+def pairwise_scores(records, clusters):
+    """(precision, recall) of the record pairs placed in the same cluster."""
+    predicted = pairs(len(members) for members in clusters.values())
+    correct = sum(pairs(Counter(records[i]['entity'] for i in members).values())
+                  for members in clusters.values())
+    planted = pairs(Counter(record['entity'] for record in records).values())
+    return (correct / predicted if predicted else 1.0), (correct / planted if planted else 1.0)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', nargs='+', type=int, default=[100_000, 250_000, 500_000, 1_000_000])
+    parser.add_argument('--seed', type=int, default=11)
+    args = parser.parse_args()
+
+    print(f"{'rows':>9} {'seconds':>8} {'us/row':>7} {'base':>6} {'cmp/row':>8} {'capped':>7} "
+          f"{'planted':>8} {'merged':>8} {'precision':>9} {'recall':>7}")
+    for size in args.sizes:
+        rng = random.Random(args.seed)
+        records = synthetic_records(size, rng)
+        started = time.perf_counter()
+        for record in records:
+            geohash(record['latitude'], record['longitude'])
+        base = time.perf_counter() - started
+        stats = {}
+        started = time.perf_counter()
+        clusters = resolve_identities(records, stats=stats)
+        assign_slugs(records, clusters)
+        elapsed = time.perf_counter() - started
+        precision, recall = pairwise_scores(records, clusters)
+        planted = size - len({record['entity'] for record in records})
+        print(f"{size:>9} {elapsed:>8.2f} {elapsed / size * 1e6:>7.1f} {base / size * 1e6:>6.1f} "
+              f"{stats['comparisons'] / size:>8.2f} "
+              f"{stats['capped_blocks']:>7} {planted:>8} {size - len(clusters):>8} "
+              f"{precision:>9.4f} {recall:>7.4f}", flush=True)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,202 @@
+"""
+Local load benchmark: gunicorn (Procfile settings) vs. the async ASGI app.
+
+Starts both servers against the same DATABASE_URL, then drives each with a
+fixed number of concurrent keep-alive clients for a fixed duration and
+reports throughput and latency percentiles. Optionally every request is
+sent slowly (--slow-client-delay), which is what exhausts gthread workers:
+
+    python benchmarks/load_benchmark.py --concurrency 8 64 256 --duration 15
+
+Only the standard library is used on the client side.
+"""
+import os
+import sys
+import time
+import signal
+import asyncio
+import argparse
+import subprocess
+from urllib.parse import urlsplit
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SERVERS = {
+    'gunicorn-gthread': ['gunicorn', '--workers=2', '--threads=4', '--worker-class=gthread',
+                         '--timeout', '120', '--bind', '127.0.0.1:{port}', 'app:app'],
+    'hypercorn-asgi': ['hypercorn', '--workers', '1', '--bind', '127.0.0.1:{port}', 'asgi:asgi_app'],
+}
+
+
+def start_server(name, port):
+    command = [part.format(port=port) for part in SERVERS[name]]
+    return subprocess.Popen(command, cwd=ROOT, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+                            start_new_session=True)
+
+
+def stop_server(process):
+    try:
+        os.killpg(process.pid, signal.SIGTERM)
+        process.wait(timeout=10)
+    except (ProcessLookupError, subprocess.TimeoutExpired):
+        os.killpg(process.pid, signal.SIGKILL)
+
+
+async def wait_until_healthy(host, port, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            status, _ = await fetch_once(host, port, '/health')
+            if status == 200:
+                return
+        except OSError:
+            pass
+        await asyncio.sleep(0.5)
+    raise RuntimeError(f"Server on port {port} did not become healthy")
+
+
+async def read_response(reader):
+    status_line = await reader.readline()
+    if not status_line:
+        raise ConnectionError("Connection closed by server")
+    status = int(status_line.split()[1])
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b'\r\n', b'\n', b''):
+            break
+        key, _, value = line.decode('latin-1').partition(':')
+        headers[key.strip().lower()] = value.strip()
+
+    if headers.get('transfer-encoding', '').lower() == 'chunked':
+        body = bytearray()
+        while True:
+            size = int((await reader.readline()).strip(), 16)
+            if size == 0:
+                await reader.readline()
+                break
+            body += await reader.readexactly(size)
+            await reader.readline()
+    else:
+        body = await reader.readexactly(int(headers.get('content-length', 0)))
+    return status, headers, bytes(body)
+
+
+async def send_request(writer, host, path, slow_delay):
+    request = (f"GET {path} HTTP/1.1\r\nHost: {host}\r\n"
+               f"Connection: keep-alive\r\nAccept: text/html\r\n\r\n").encode()
+    if slow_delay:
+        # Dribble the request in two halves to hold the worker like a slow client
+        half = len(request) // 2
+        writer.write(request[:half])
+        await writer.drain()
+        await asyncio.sleep(slow_delay)
+        writer.write(request[half:])
+    else:
+        writer.write(request)
+    await writer.drain()
+
+
+async def fetch_once(host, port, path):
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        await send_request(writer, host, path, 0)
+        status, _, body = await read_response(reader)
+        return status, body
+    finally:
+        writer.close()
+
+
+async def client(host, port, paths, stop_at, slow_delay, latencies, errors):
+    reader = writer = None
+    index = 0
+    while time.monotonic() < stop_at:
+        path = paths[index % len(paths)]
+        index += 1
+        started = time.monotonic()
+        try:
+            if writer is None:
+                reader, writer = await asyncio.open_connection(host, port)
+            await send_request(writer, host, path, slow_delay)
+            status, headers, _ = await read_response(reader)
+            if status >= 500:
+                errors.append(status)
+            else:
+                latencies.append(time.monotonic() - started)
+            if headers.get('connection', '').lower() == 'close':
+                writer.close()
+                writer = None
+        except (OSError, ConnectionError, asyncio.IncompleteReadError, ValueError, IndexError):
+            errors.append('connection')
+            if writer is not None:
+                writer.close()
+            writer = None
+    if writer is not None:
+        writer.close()
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return float('nan')
+    index = min(len(sorted_values) - 1, int(round(fraction * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+async def run_load(host, port, paths, concurrency, duration, slow_delay):
+    latencies, errors = [], []
+    stop_at = time.monotonic() + duration
+    started = time.monotonic()
+    await asyncio.gather(*(client(host, port, paths, stop_at, slow_delay, latencies, errors)
+                           for _ in range(concurrency)))
+    elapsed = time.monotonic() - started
+    latencies.sort()
+    return {
+        'requests': len(latencies),
+        'errors': len(errors),
+        'rps': len(latencies) / elapsed,
+        'p50': percentile(latencies, 0.50) * 1000,
+        'p95': percentile(latencies, 0.95) * 1000,
+        'p99': percentile(latencies, 0.99) * 1000,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--servers', nargs='+', choices=sorted(SERVERS), default=sorted(SERVERS))
+    parser.add_argument('--concurrency', nargs='+', type=int, default=[8, 64, 256])
+    parser.add_argument('--duration', type=float, default=15.0, help='Seconds per concurrency level.')
+    parser.add_argument('--paths', nargs='+', default=['/', '/cities', '/search?q=golf'])
+    parser.add_argument('--slow-client-delay', type=float, default=0.0,
+                        help='Seconds each client pauses mid-request to simulate slow connections.')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--external', metavar='URL',
+                        help='Benchmark an already running server instead of starting them.')
+    args = parser.parse_args()
+
+    if args.external:
+        parts = urlsplit(args.external)
+        targets = [(args.external, None, parts.hostname, parts.port or 80)]
+    else:
+        targets = [(name, args.port + offset, '127.0.0.1', args.port + offset)
+                   for offset, name in enumerate(args.servers)]
+
+    print(f"{'server':<18} {'conc':>5} {'reqs':>7} {'errors':>6} {'req/s':>8} "
+          f"{'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}")
+    for name, port, host, target_port in targets:
+        process = start_server(name, port) if port is not None else None
+        try:
+            asyncio.run(wait_until_healthy(host, target_port))
+            for concurrency in args.concurrency:
+                result = asyncio.run(run_load(host, target_port, args.paths, concurrency,
+                                              args.duration, args.slow_client_delay))
+                print(f"{name:<18} {concurrency:>5} {result['requests']:>7} {result['errors']:>6} "
+                      f"{result['rps']:>8.1f} {result['p50']:>8.1f} {result['p95']:>8.1f} "
+                      f"{result['p99']:>8.1f}", flush=True)
+        finally:
+            if process is not None:
+                stop_server(process)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
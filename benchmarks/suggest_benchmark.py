@@ -0,0 +1,73 @@
+"""
+Latency benchmark for the /api/suggest prefix index.
+
+Builds a SuggestIndex over synthetic venue names and "City, ST" labels with a
+skewed popularity distribution, then times prefix lookups of 1-8 characters
+drawn from real keys (the per-keystroke pattern of the search box):
+
+    python benchmarks/suggest_benchmark.py --entries 1000000 --queries 20000
+"""
+import os
+import sys
+import time
+import random
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from suggest import SuggestIndex, fold  # noqa: E402
+
+WORDS = ['golf', 'indoor', 'swing', 'tee', 'links', 'club', 'fairway', 'birdie', 'eagle', 'par',
+         'bogey', 'green', 'simulator', 'lounge', 'studio', 'range', 'x-golf', 'topgolf', 'café',
+         'north', 'south', 'river', 'mountain', 'pacific', 'summit', 'valley', 'urban', 'sports']
+STATES = ['OR', 'WA', 'CA', 'ID', 'NV', 'AZ', 'UT', 'CO', 'TX', 'NY', 'FL', 'BC', 'ON']
+
+
+def synthetic_entries(count, rng):
+    cities = [f"{rng.choice(WORDS).title()}{rng.choice(['ville', 'ton', ' City', 'field', ' Falls'])}"
+              for _ in range(max(1, count // 50))]
+    for i in range(count):
+        if i % 20 == 0:
+            label = f"{rng.choice(cities)}, {rng.choice(STATES)}"
+        else:
+            words = rng.sample(WORDS, rng.randint(1, 3))
+            label = ' '.join(word.title() for word in words) + f" {rng.randint(1, 9999)}"
+        score = rng.paretovariate(1.2)
+        yield label, score, {'label': label}
+
+
+def percentile(sorted_values, fraction):
+    return sorted_values[min(len(sorted_values) - 1, int(fraction * (len(sorted_values) - 1)))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--entries', type=int, default=1_000_000)
+    parser.add_argument('--queries', type=int, default=20_000)
+    parser.add_argument('--limit', type=int, default=8)
+    parser.add_argument('--seed', type=int, default=7)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    entries = list(synthetic_entries(args.entries, rng))
+
+    started = time.perf_counter()
+    index = SuggestIndex(entries)
+    print(f"Built index over {len(index)} entries in {time.perf_counter() - started:.2f}s")
+
+    labels = [fold(label) for label, _, _ in rng.sample(entries, min(len(entries), args.queries))]
+    queries = [label[:rng.randint(1, min(8, len(label)))] for label in labels]
+
+    timings = []
+    for query in queries:
+        started = time.perf_counter()
+        index.search(query, args.limit)
+        timings.append((time.perf_counter() - started) * 1000)
+    timings.sort()
+    print(f"{len(queries)} queries: p50 {percentile(timings, 0.50):.3f} ms, "
+          f"p99 {percentile(timings, 0.99):.3f} ms, max {timings[-1]:.3f} ms")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
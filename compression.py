@@ -0,0 +1,157 @@
+"""
+gzip/brotli response compression.
+
+Text responses above a size threshold are compressed with the best encoding
+the client accepts (brotli, then gzip). HTML responses marked
+Cache-Control: public are pages whose bytes repeat across requests, so the
+compressed body is kept in a byte-bounded LRU keyed by a hash of the body;
+the same hash is sent as the ETag. A cache miss is compressed inline at a
+fast level and served right away, while a background thread recompresses
+the page at maximum quality and swaps the smaller body into the cache. Everything else is compressed on the fly at a cheaper level, and
+streamed responses are compressed chunk by chunk with a flush after each
+one, so the browser still gets the first bytes early.
+"""
+import gzip
+import zlib
+import hashlib
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import brotli
+from lru import LRUCache
+
+COMPRESSIBLE_TYPES = frozenset([
+    'text/html', 'text/css', 'text/plain', 'text/xml', 'text/javascript',
+    'application/json', 'application/javascript', 'application/ld+json',
+    'application/xml', 'image/svg+xml',
+])
+
+# Levels for on-the-fly responses, the first cached copy of a page (compressed
+# inside the request) and its background recompression
+ON_THE_FLY, INLINE, BEST = range(3)
+GZIP_LEVELS = (6, 6, 9)
+BROTLI_QUALITIES = (4, 5, 11)
+
+# Pages waiting for background recompression at most; more misses are served at INLINE level
+MAX_PENDING_RECOMPRESSIONS = 64
+
+
+def choose_encoding(accept_encodings):
+    """Pick 'br' or 'gzip' from a werkzeug Accept-Encoding header, or None."""
+    for encoding in ('br', 'gzip'):
+        if accept_encodings[encoding]:
+            return encoding
+    return None
+
+
+def compress(data, encoding, level=ON_THE_FLY):
+    if encoding == 'br':
+        return brotli.compress(data, mode=brotli.MODE_TEXT, quality=BROTLI_QUALITIES[level])
+    return gzip.compress(data, compresslevel=GZIP_LEVELS[level], mtime=0)
+
+
+def compress_stream(chunks, encoding):
+    """Compress an iterable of str/bytes chunks, flushing after each one."""
+    if encoding == 'br':
+        compressor = brotli.Compressor(mode=brotli.MODE_TEXT, quality=BROTLI_QUALITIES[ON_THE_FLY])
+        compress_chunk, flush, finish = compressor.process, compressor.flush, compressor.finish
+    else:
+        compressor = zlib.compressobj(GZIP_LEVELS[ON_THE_FLY], zlib.DEFLATED, 31)
+        compress_chunk, finish = compressor.compress, compressor.flush
+        flush = lambda: compressor.flush(zlib.Z_SYNC_FLUSH)  # noqa: E731
+    for chunk in chunks:
+        if isinstance(chunk, str):
+            chunk = chunk.encode('utf-8')
+        if chunk:
+            yield compress_chunk(chunk) + flush()
+    yield finish()
+
+
+class CompressedCache(LRUCache):
+    """
+    Thread-safe LRU of compressed bodies, bounded by their total size in bytes.
+
+    With recompress, bodies compressed inline are recompressed at BEST level
+    on one background thread and replaced in place if still cached.
+    """
+
+    def __init__(self, max_bytes=32 * 1024 * 1024, recompress=True):
+        super().__init__(max_bytes=max_bytes)
+        self.recompress = recompress
+        self._pending = set()
+        self._pending_lock = threading.Lock()
+        # Started on first use, so each forked worker gets its own thread
+        self._executor = None
+
+    @staticmethod
+    def digest(data):
+        return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+    def get_or_compress(self, digest, data, encoding):
+        key = (digest, encoding)
+        compressed = self.get(key)
+        if compressed is None:
+            # Compress outside the lock; two requests racing on a new page may both compress it
+            compressed = compress(data, encoding, INLINE)
+            self.set(key, compressed)
+            self._schedule_recompression(key, data, encoding)
+        return compressed
+
+    def _schedule_recompression(self, key, data, encoding):
+        if not self.recompress:
+            return
+        with self._pending_lock:
+            if key in self._pending or len(self._pending) >= MAX_PENDING_RECOMPRESSIONS:
+                return
+            self._pending.add(key)
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='recompress')
+        self._executor.submit(self._recompress, key, data, encoding)
+
+    def _recompress(self, key, data, encoding):
+        try:
+            compressed = compress(data, encoding, BEST)
+            if key in self:
+                self.set(key, compressed)
+        finally:
+            with self._pending_lock:
+                self._pending.discard(key)
+
+
+def compress_response(response, request, cache, min_size=500):
+    """
+    Compress a Flask response in place if the client and content allow it.
+
+    Call it from an after_request handler.
+    """
+    if (response.status_code != 200 or 'Content-Encoding' in response.headers
+            or response.direct_passthrough or response.mimetype not in COMPRESSIBLE_TYPES):
+        return response
+    response.vary.add('Accept-Encoding')
+    encoding = choose_encoding(request.accept_encodings)
+
+    if response.is_streamed:
+        if encoding:
+            response.response = compress_stream(response.response, encoding)
+            response.headers['Content-Encoding'] = encoding
+            response.headers.pop('Content-Length', None)
+        return response
+
+    data = response.get_data()
+    cacheable = response.cache_control.public and response.mimetype == 'text/html'
+    if cacheable:
+        digest = cache.digest(data)
+        response.set_etag(digest, weak=True)
+        response.make_conditional(request)
+        if response.status_code == 304:
+            return response
+    if not encoding or len(data) < min_size:
+        return response
+
+    if cacheable:
+        compressed = cache.get_or_compress(digest, data, encoding)
+    else:
+        compressed = compress(data, encoding)
+    if len(compressed) < len(data):
+        response.set_data(compressed)
+        response.headers['Content-Encoding'] = encoding
+    return response
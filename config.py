@@ -1,8 +1,59 @@
 import os
+import tempfile
 from dotenv import load_dotenv
 
 load_dotenv()
 
 class Config:
     GOOGLE_MAPS_API_KEY = os.getenv('GOOGLE_MAPS_API_KEY')
-    SECRET_KEY = os.getenv('SECRET_KEY', 'dev') 
\ No newline at end of file
+    SECRET_KEY = os.getenv('SECRET_KEY', 'dev')
+
+    # Background Google Sheet sync
+    SYNC_INTERVAL_SECONDS = int(os.getenv('SYNC_INTERVAL_SECONDS', '3600'))
+    SYNC_STATEMENT_TIMEOUT_MS = int(os.getenv('SYNC_STATEMENT_TIMEOUT_MS', '30000'))
+    SYNC_LOCK_KEY = int(os.getenv('SYNC_LOCK_KEY', '1735355494'))
+
+    # Templates: reload on change in debug mode (None lets Flask follow
+    # app.debug), keep compiled bytecode across worker starts, and cache
+    # rendered per-location fragments
+    TEMPLATES_AUTO_RELOAD = None
+    JINJA_BYTECODE_CACHE_DIR = os.getenv('JINJA_BYTECODE_CACHE_DIR',
+                                         os.path.join(tempfile.gettempdir(), 'golf-directory-jinja'))
+    FRAGMENT_CACHE_SIZE = int(os.getenv('FRAGMENT_CACHE_SIZE', '5000'))
+
+    # Map markers API
+    MARKER_CACHE_TTL_SECONDS = int(os.getenv('MARKER_CACHE_TTL_SECONDS', '300'))
+    MARKER_MAX_TILES = int(os.getenv('MARKER_MAX_TILES', '64'))
+
+    # Search suggestions
+    SUGGEST_REFRESH_SECONDS = int(os.getenv('SUGGEST_REFRESH_SECONDS', '60'))
+
+    # Nearby venues on location pages
+    NEIGHBORS_PER_LOCATION = int(os.getenv('NEIGHBORS_PER_LOCATION', '10'))
+    NEARBY_DISPLAY_COUNT = int(os.getenv('NEARBY_DISPLAY_COUNT', '6'))
+    NEIGHBORS_STATEMENT_TIMEOUT_MS = int(os.getenv('NEIGHBORS_STATEMENT_TIMEOUT_MS', '600000'))
+
+    # Listing ranking (Bayesian average prior) and page sizes
+    RANKING_PRIOR_MEAN = float(os.getenv('RANKING_PRIOR_MEAN', '4.0'))
+    RANKING_PRIOR_WEIGHT = float(os.getenv('RANKING_PRIOR_WEIGHT', '10'))
+    FEATURED_LOCATIONS_COUNT = int(os.getenv('FEATURED_LOCATIONS_COUNT', '24'))
+    API_MAX_LIMIT = int(os.getenv('API_MAX_LIMIT', '200'))
+
+    # Ingestion duplicate detection: minimum name trigram similarity within a zip/geohash block
+    DEDUP_NAME_THRESHOLD = float(os.getenv('DEDUP_NAME_THRESHOLD', '0.7'))
+
+    # Parquet/Arrow snapshots: rows per streamed batch (and Parquet row group)
+    SNAPSHOT_CHUNK_SIZE = int(os.getenv('SNAPSHOT_CHUNK_SIZE', '50000'))
+
+    # Response compression and streamed listing pages
+    COMPRESS_MIN_SIZE = int(os.getenv('COMPRESS_MIN_SIZE', '500'))
+    COMPRESS_CACHE_MAX_BYTES = int(os.getenv('COMPRESS_CACHE_MAX_BYTES', str(32 * 1024 * 1024)))
+    PAGE_CACHE_MAX_AGE = int(os.getenv('PAGE_CACHE_MAX_AGE', '300'))
+    STREAM_MIN_ROWS = int(os.getenv('STREAM_MIN_ROWS', '100'))
+    STREAM_YIELD_PER = int(os.getenv('STREAM_YIELD_PER', '100'))
+
+    # On-demand request profiling (signed X-Profile-Token header or _profile query parameter)
+    PROFILING_ENABLED = os.getenv('PROFILING_ENABLED', 'false').lower() in ('1', 'true', 'yes')
+    PROFILE_DIR = os.getenv('PROFILE_DIR', os.path.join(tempfile.gettempdir(), 'golf-directory-profiles'))
+    PROFILE_TOKEN_MAX_AGE = int(os.getenv('PROFILE_TOKEN_MAX_AGE', '3600'))
+    PROFILE_SAMPLE_INTERVAL = float(os.getenv('PROFILE_SAMPLE_INTERVAL', '0.001'))
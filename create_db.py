@@ -1,6 +1,9 @@
 from app import app, db
+from partitions import ensure_states
 
 with app.app_context():
     db.drop_all()  # Drop existing tables
     db.create_all()  # Create tables with new schema
+    ensure_states(db.session.connection())  # Seed states and create their locations partitions
+    db.session.commit()
     print("Database tables created successfully!") 
\ No newline at end of file
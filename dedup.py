@@ -0,0 +1,308 @@
+"""
+Identity resolution for ingested venues.
+
+Rows are matched in two passes:
+
+1. Exact identity: rows sharing a Google place_id or google_id are the same
+   venue.
+2. Fuzzy identity: rows are blocked by zip code and by geohash cell, and
+   within a block, names are compared by character-trigram Jaccard
+   similarity. Small blocks compare every pair; large blocks are sorted by
+   name and only compare neighbours within a fixed window, nearest first,
+   and stop after max_block_comparisons pairs. A row is compared at most
+   `window` times per block, and an oversized block (say, a bogus zip that
+   thousands of rows share) costs a bounded amount of work. Two groups are never merged
+   by name when both carry a place_id (or both a google_id) and those ids
+   differ: they are separate venues that happen to share a name.
+
+Matches are merged with union-find. assign_slugs then gives every distinct
+venue a stable, unique slug: existing slugs are kept, a name shared by
+several venues gets the city (then state) appended, and only then a counter.
+"""
+from slugify import slugify
+from ranking import bayesian_score, REVIEW_STARS
+from suggest import fold
+
+GEOHASH_ALPHABET = '0123456789bcdefghjkmnpqrstuvwxyz'
+
+
+def geohash(latitude, longitude, precision=6):
+    """Standard base32 geohash of a coordinate."""
+    lat_range, lon_range = [-90.0, 90.0], [-180.0, 180.0]
+    chars, bits, value, even = [], 0, 0, True
+    while len(chars) < precision:
+        span, coordinate = (lon_range, longitude) if even else (lat_range, latitude)
+        middle = (span[0] + span[1]) / 2
+        if coordinate >= middle:
+            value = (value << 1) | 1
+            span[0] = middle
+        else:
+            value <<= 1
+            span[1] = middle
+        even = not even
+        bits += 1
+        if bits == 5:
+            chars.append(GEOHASH_ALPHABET[value])
+            bits, value = 0, 0
+    return ''.join(chars)
+
+
+def name_trigrams(name, folded=None):
+    """Character trigrams of a name; pass folded if fold(name) is already at hand."""
+    padded = f"  {fold(name or '') if folded is None else folded} "
+    return frozenset(padded[i:i + 3] for i in range(len(padded) - 2))
+
+
+def trigram_similarity(a, b):
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+
+GOOGLE_ID_FIELDS = ('place_id', 'google_id')
+
+
+class _UnionFind:
+    def __init__(self, size):
+        self.parent = list(range(size))
+        # root -> {field: Google ids seen in its group}, for groups that have any
+        self.ids = {}
+
+    def find(self, i):
+        root = i
+        while self.parent[root] != root:
+            root = self.parent[root]
+        while self.parent[i] != root:
+            self.parent[i], i = root, self.parent[i]
+        return root
+
+    def conflicting(self, root_a, root_b):
+        """Whether two groups carry different values of the same Google id field."""
+        ids_a, ids_b = self.ids.get(root_a), self.ids.get(root_b)
+        if not ids_a or not ids_b:
+            return False
+        return any(field in ids_b and ids_a[field].isdisjoint(ids_b[field]) for field in ids_a)
+
+    def union(self, a, b):
+        root_a, root_b = self.find(a), self.find(b)
+        if root_a != root_b:
+            # Keep the lower index as root so clusters are stable across runs
+            root, child = min(root_a, root_b), max(root_a, root_b)
+            self.parent[child] = root
+            child_ids = self.ids.pop(child, None)
+            if child_ids:
+                root_ids = self.ids.setdefault(root, {})
+                for field, values in child_ids.items():
+                    root_ids.setdefault(field, set()).update(values)
+
+
+def resolve_identities(records, name_threshold=0.7, geohash_precision=6, window=8,
+                       max_block_comparisons=1000, stats=None):
+    """
+    Group records that describe the same venue.
+
+    Each record is a dict with 'name', 'place_id', 'google_id', 'zip_code',
+    'latitude' and 'longitude' (any may be None). Returns a dict mapping a
+    cluster id to the sorted indices of its records. stats, if given, is
+    filled with the number of name comparisons and of blocks that hit the cap.
+    """
+    union_find = _UnionFind(len(records))
+
+    first_by_key = {}
+    blocks = {}
+    for i, record in enumerate(records):
+        for field in GOOGLE_ID_FIELDS:
+            if record.get(field):
+                union_find.ids.setdefault(i, {})[field] = {record[field]}
+    for i, record in enumerate(records):
+        for field in GOOGLE_ID_FIELDS:
+            if record.get(field):
+                key = (field, record[field])
+                if key in first_by_key:
+                    union_find.union(first_by_key[key], i)
+                else:
+                    first_by_key[key] = i
+        if record.get('zip_code'):
+            blocks.setdefault(('zip', record['zip_code']), []).append(i)
+        if record.get('latitude') is not None and record.get('longitude') is not None:
+            cell = geohash(record['latitude'], record['longitude'], geohash_precision)
+            blocks.setdefault(('geo', cell), []).append(i)
+
+    # Folded names and trigrams are computed once per record, and only for records in a block
+    folded = {}
+    trigrams = {}
+
+    def folded_name(i):
+        if i not in folded:
+            folded[i] = fold(records[i]['name'] or '')
+        return folded[i]
+
+    def similar(a, b):
+        if a not in trigrams:
+            trigrams[a] = name_trigrams(None, folded_name(a))
+        if b not in trigrams:
+            trigrams[b] = name_trigrams(None, folded_name(b))
+        return trigram_similarity(trigrams[a], trigrams[b]) >= name_threshold
+
+    comparisons = capped_blocks = 0
+    for members in blocks.values():
+        if len(members) < 2:
+            continue
+        if len(members) <= window + 1:
+            pairs = ((a, b) for offset, a in enumerate(members) for b in members[offset + 1:])
+        else:
+            members = sorted(members, key=folded_name)
+            pairs = ((members[offset], members[offset + distance]) for distance in range(1, window + 1)
+                     for offset in range(len(members) - distance))
+        budget = max_block_comparisons
+        for a, b in pairs:
+            if budget == 0:
+                capped_blocks += 1
+                break
+            budget -= 1
+            root_a, root_b = union_find.find(a), union_find.find(b)
+            if root_a != root_b and similar(a, b) and not union_find.conflicting(root_a, root_b):
+                union_find.union(a, b)
+        comparisons += max_block_comparisons - budget
+
+    if stats is not None:
+        stats.update(comparisons=comparisons, capped_blocks=capped_blocks)
+
+    clusters = {}
+    for i in range(len(records)):
+        clusters.setdefault(union_find.find(i), []).append(i)
+    return clusters
+
+
+def split_by_anchor(records, members, anchors):
+    """
+    Split a cluster that holds several anchors (e.g. already stored venues).
+
+    Each other member goes to the anchor sharing its place_id or google_id.
+    The rest go to the anchor with the most similar name (the first one on a
+    tie), preferring anchors nothing has matched yet so that no anchor is
+    left empty while another collects every row. Returns {anchor: [members]},
+    each list starting with its anchor.
+    """
+    groups = {anchor: [anchor] for anchor in anchors}
+    unmatched = []
+    for i in members:
+        if i in groups:
+            continue
+        record = records[i]
+        match = next((anchor for anchor in anchors for field in GOOGLE_ID_FIELDS
+                      if record.get(field) and records[anchor].get(field) == record[field]), None)
+        if match is None:
+            unmatched.append(i)
+        else:
+            groups[match].append(i)
+
+    anchor_trigrams = {anchor: name_trigrams(records[anchor].get('name')) for anchor in anchors}
+    for i in unmatched:
+        trigrams = name_trigrams(records[i].get('name'))
+        candidates = [anchor for anchor in anchors if len(groups[anchor]) == 1] or anchors
+        match = max(candidates, key=lambda anchor: (trigram_similarity(trigrams, anchor_trigrams[anchor]),
+                                                    -anchors.index(anchor)))
+        groups[match].append(i)
+    return groups
+
+
+def merge_records(records, prior_mean=4.0, prior_weight=10):
+    """
+    Merge duplicate location dicts into one.
+
+    The record with the most reviews (then the most filled-in fields) wins,
+    and its empty fields are filled from the others. A 'score' is recomputed
+    from the merged review fields, since they may now come from several rows.
+    """
+    def completeness(record):
+        return (record.get('reviews_count') or 0, sum(value not in (None, '', [], {}) for value in record.values()))
+
+    ordered = sorted(records, key=completeness, reverse=True)
+    merged = dict(ordered[0])
+    for key, value in merged.items():
+        if value in (None, '', [], {}):
+            for other in ordered[1:]:
+                if other.get(key) not in (None, '', [], {}):
+                    merged[key] = other[key]
+                    break
+    if 'score' in merged:
+        merged['score'] = bayesian_score(
+            merged.get('rating'), merged.get('reviews_count'),
+            [merged.get(f'reviews_per_score_{stars}') for stars in REVIEW_STARS],
+            prior_mean=prior_mean, prior_weight=prior_weight
+        )
+    return merged
+
+
+def _slug_candidates(record, base, name_shared):
+    name = record.get('name') or ''
+    city = record.get('city') or ''
+    state = record.get('state') or ''
+    if base and not name_shared:
+        yield base
+    if city:
+        yield slugify(f"{name} {city}")
+    if city or state:
+        yield slugify(f"{name} {city} {state}")
+    if record.get('zip_code'):
+        yield slugify(f"{name} {city} {state} {record['zip_code']}")
+    if base and name_shared:
+        yield base
+
+
+def assign_slugs(records, clusters):
+    """
+    Give every cluster a unique slug.
+
+    Clusters containing a record with an existing 'slug' keep the first one,
+    and every existing slug in the cluster stays reserved. New clusters get
+    the name slug when no other venue shares the name, otherwise name-city,
+    then name-city-state, then name-city-state-zip, then a numeric suffix.
+    New clusters are processed in identity order so the same input always
+    produces the same slugs.
+    """
+    slugs = {}
+    used = set()
+    for cluster, members in clusters.items():
+        # A cluster may hold several stored venues; every one of their slugs is taken
+        existing = [records[i]['slug'] for i in members if records[i].get('slug')]
+        if existing:
+            slugs[cluster] = existing[0]
+            used.update(existing)
+
+    base_slugs = {}
+    name_counts = {}
+    slug_cache = {}
+    for cluster, members in clusters.items():
+        name = records[members[0]].get('name') or ''
+        if name not in slug_cache:
+            slug_cache[name] = slugify(name)
+        base_slugs[cluster] = slug_cache[name]
+        name_counts[slug_cache[name]] = name_counts.get(slug_cache[name], 0) + 1
+
+    def identity(cluster):
+        record = records[clusters[cluster][0]]
+        return (record.get('place_id') or '', record.get('google_id') or '',
+                record.get('name') or '', record.get('zip_code') or '')
+
+    for cluster in sorted((c for c in clusters if c not in slugs), key=identity):
+        record = records[clusters[cluster][0]]
+        base = base_slugs[cluster]
+        slug = stem = None
+        for candidate in _slug_candidates(record, base, name_counts[base] > 1):
+            if not candidate:
+                continue
+            stem = candidate
+            if candidate not in used:
+                slug = candidate
+                break
+        if slug is None:
+            stem = stem or 'location'
+            suffix = 2
+            while f"{stem}-{suffix}" in used:
+                suffix += 1
+            slug = f"{stem}-{suffix}"
+        slugs[cluster] = slug
+        used.add(slug)
+    return slugs
@@ -0,0 +1,60 @@
+"""
+Per-location HTML fragment cache.
+
+Location cards and schema.org JSON-LD blocks live in templates/fragments/ and
+are rendered once per (fragment, slug, updated_at). Listing pages then
+assemble the cached HTML instead of running the card markup for every row,
+and any change to a location bumps updated_at so stale entries simply stop
+being hit and age out of the LRU.
+"""
+from markupsafe import Markup
+from lru import LRUCache
+
+
+class FragmentCache(LRUCache):
+    """Thread-safe, bounded LRU of rendered fragments."""
+
+    def __init__(self, max_entries=5000):
+        super().__init__(max_entries=max_entries)
+
+    @staticmethod
+    def key(name, location):
+        return (name, location.slug, location.updated_at)
+
+
+def make_fragment_helpers(cache, jinja_env):
+    """Build the location_fragment/location_fragments template globals."""
+
+    def location_fragment(name, location):
+        key = cache.key(name, location)
+        html = cache.get(key)
+        if html is None:
+            html = Markup(jinja_env.get_template(f'fragments/{name}.html').render(location=location))
+            cache.set(key, html)
+        return html
+
+    def location_fragments(name, locations, join=True):
+        # Unjoined fragments are produced lazily, so a streamed page emits each card as its row arrives
+        fragments = (location_fragment(name, location) for location in locations)
+        return Markup('').join(fragments) if join else fragments
+
+    return {'location_fragment': location_fragment, 'location_fragments': location_fragments}
+
+
+def make_async_fragment_helpers(cache, jinja_env):
+    """Async versions of make_fragment_helpers for Quart's async Jinja environment."""
+
+    async def location_fragment(name, location):
+        key = cache.key(name, location)
+        html = cache.get(key)
+        if html is None:
+            template = jinja_env.get_template(f'fragments/{name}.html')
+            html = Markup(await template.render_async(location=location))
+            cache.set(key, html)
+        return html
+
+    async def location_fragments(name, locations, join=True):
+        fragments = [await location_fragment(name, location) for location in locations]
+        return Markup('').join(fragments) if join else fragments
+
+    return {'location_fragment': location_fragment, 'location_fragments': location_fragments}
@@ -0,0 +1,12 @@
+"""
+Gunicorn settings shared by every start command (gunicorn loads this file from the working directory).
+
+Command-line flags in the Procfile, render.yaml and railway.toml still win.
+"""
+
+
+def post_worker_init(worker):
+    # Build the in-memory suggest index before the worker takes requests,
+    # so the first /api/suggest call doesn't wait on it
+    from app import suggest_index
+    suggest_index.warm()
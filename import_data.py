@@ -1,9 +1,11 @@
 import pandas as pd
-from app import app, db, Location
-from slugify import slugify
+from app import (app, db, Location, compute_location_neighbors, compute_score,
+                 load_identity_records, plan_location_upserts)
+from partitions import ensure_states, load_state_codes, replace_state_partition, to_state_code
+from ranking import REVIEW_STARS
 import re
 import json
-from sqlalchemy import text
+import uuid
 from datetime import datetime
 import logging
 import sys
@@ -69,45 +71,39 @@ def setup_database():
     try:
         logger.info("Creating database tables...")
         db.create_all()
+        ensure_states(db.session.connection())
+        db.session.commit()
         logger.info("Database tables created successfully")
         return True
     except Exception as e:
         logger.error(f"Error creating database tables: {str(e)}")
         return False
 
-def import_locations():
-    """Import location data into the database."""
+def import_locations(states=None):
+    """
+    Import location data into the database.
+
+    Every state in the CSV (or only the given state codes) is replaced as a
+    whole: its rows are loaded into a staging table that is swapped in for
+    the state's partition, leaving other states untouched.
+    """
     try:
         # Read the CSV file
         logger.info("Reading locations data from CSV...")
         df = pd.read_csv('data/locations.csv')
         logger.info(f"CSV columns found: {', '.join(df.columns)}")
         
-        # Start a new transaction
-        logger.info("Starting new transaction...")
-        
-        # Clear existing data
-        logger.info("Clearing existing data...")
-        try:
-            db.session.execute(text('TRUNCATE TABLE locations CASCADE'))
-            db.session.commit()
-            logger.info("Existing data cleared successfully")
-        except Exception as e:
-            logger.warning(f"Error clearing existing data (this is normal for first run): {str(e)}")
-            db.session.rollback()
+        state_codes = load_state_codes(db.session.connection())
+        states = {state.upper() for state in states} if states else None
         
-        # Process each row
+        # Parse each row
         logger.info("Processing location data...")
         processed = 0
         skipped = 0
+        incoming = []
         
         for _, row in df.iterrows():
             try:
-                # Start a new transaction for each batch
-                if processed % 50 == 0:
-                    db.session.commit()
-                    logger.info(f"Committed batch of {processed} records")
-                
                 # Skip rows where full_address is actually a description
                 if pd.notna(row['full_address']) and ',' not in row['full_address']:
                     logger.warning(f"Skipping row with invalid address format: {row['name']}")
@@ -120,18 +116,27 @@ def import_locations():
                     logger.warning(f"Could not extract city from address: {row['full_address']}")
                     skipped += 1
                     continue
-
-                # Create slug from business name
-                slug = slugify(row['name'])
                 
                 # Parse hours
                 hours = parse_hours(row.get('working_hours') or row.get('working_hours_old_format'))
                 
-                # Ensure state is uppercase
-                state = row['state'].upper()[:2] if pd.notna(row['state']) else None
+                # Map the state (code or full name) to a code from the states lookup
+                state = to_state_code(row['state'], state_codes) if pd.notna(row['state']) else None
+                if state is None:
+                    logger.warning(f"Skipping row with unknown state {row['state']} (add it with `flask add-state`): {row['name']}")
+                    skipped += 1
+                    continue
+                if states and state not in states:
+                    continue
+
+                # Review histogram feeds the listing rank score
+                rating = float(row['rating']) if pd.notna(row['rating']) else None
+                reviews_count = int(row['reviews']) if pd.notna(row['reviews']) else None
+                per_score = [int(row[f'reviews_per_score_{stars}']) if pd.notna(row.get(f'reviews_per_score_{stars}')) else None
+                             for stars in REVIEW_STARS]
                 
-                # Create location object
-                location = Location(
+                # Slugs are assigned after duplicates are resolved
+                incoming.append(dict(
                     business_name=row['name'],
                     address=row['full_address'],
                     city=city,
@@ -141,10 +146,15 @@ def import_locations():
                     website=str(row['site']) if pd.notna(row['site']) else None,
                     description=row['description'] if pd.notna(row['description']) else None,
                     hours=hours,
-                    slug=slug,
-                    rating=float(row['rating']) if pd.notna(row['rating']) else None,
-                    reviews_count=int(row['reviews']) if pd.notna(row['reviews']) else None,
+                    rating=rating,
+                    reviews_count=reviews_count,
                     reviews_link=str(row['reviews_link']) if pd.notna(row['reviews_link']) else None,
+                    reviews_per_score_1=per_score[0],
+                    reviews_per_score_2=per_score[1],
+                    reviews_per_score_3=per_score[2],
+                    reviews_per_score_4=per_score[3],
+                    reviews_per_score_5=per_score[4],
+                    score=compute_score(rating, reviews_count, per_score),
                     location=create_point(
                         float(row['latitude']) if pd.notna(row['latitude']) else None,
                         float(row['longitude']) if pd.notna(row['longitude']) else None
@@ -157,32 +167,52 @@ def import_locations():
                         'google_id': row['google_id'] if pd.notna(row['google_id']) else None,
                         'last_synced': datetime.utcnow().isoformat()
                     }
-                )
+                ))
                 
-                db.session.add(location)
-                processed += 1
-                logger.info(f"Successfully processed: {row['name']}")
-                
-            except SQLAlchemyError as e:
-                logger.error(f"Database error processing row for {row.get('name', 'unknown')}: {str(e)}")
-                db.session.rollback()
-                skipped += 1
-                continue
             except Exception as e:
                 logger.error(f"Error processing row for {row.get('name', 'unknown')}: {str(e)}")
                 logger.error(f"Row data: {row.to_dict()}")
                 skipped += 1
                 continue
         
-        # Final commit
-        try:
-            db.session.commit()
-            logger.info(f"Data import completed. Processed: {processed}, Skipped: {skipped}")
-            return True
-        except SQLAlchemyError as e:
-            logger.error(f"Error during final commit: {str(e)}")
-            db.session.rollback()
-            return False
+        # Merge rows describing the same venue; venues already stored keep their id and slug
+        existing = load_identity_records(db.session)
+        existing_by_id = dict(existing)
+        plan = plan_location_upserts(incoming, existing)
+        merged = sum(duplicates for _, _, duplicates in plan)
+        logger.info(f"Resolved {len(incoming)} rows into {len(plan)} locations ({merged} duplicates merged)")
+        
+        rows_by_state = {}
+        for location_id, location_data, _ in plan:
+            if location_id:
+                stored = existing_by_id[location_id]
+                if stored['state'] != location_data['state']:
+                    logger.warning(f"Skipping {location_data['business_name']}: already listed in {stored['state']} as {stored['slug']}")
+                    skipped += 1
+                    continue
+                location_data.update(id=location_id, slug=stored['slug'])
+            else:
+                location_data['id'] = uuid.uuid4()
+            rows_by_state.setdefault(location_data['state'], []).append(location_data)
+        
+        # Swap in one partition per state
+        failed_states = []
+        for state, rows in sorted(rows_by_state.items()):
+            try:
+                replace_state_partition(db.session.connection(), Location.__table__, state, rows)
+                db.session.commit()
+                processed += len(rows)
+                logger.info(f"Replaced {state} partition with {len(rows)} locations")
+            except SQLAlchemyError as e:
+                logger.error(f"Database error replacing {state} partition: {str(e)}")
+                db.session.rollback()
+                failed_states.append(state)
+                continue
+        
+        logger.info(f"Data import completed. Processed: {processed}, Merged: {merged}, Skipped: {skipped}")
+        if failed_states:
+            logger.error(f"Kept the previous data for: {', '.join(failed_states)}")
+        return not failed_states
         
     except Exception as e:
         logger.error(f"Error during import: {str(e)}")
@@ -196,10 +226,17 @@ if __name__ == "__main__":
             logger.error("Failed to setup database")
             sys.exit(1)
             
-        # Then import the data
-        if not import_locations():
+        # Then import the data, optionally only for the state codes given as arguments
+        if not import_locations(sys.argv[1:]):
             logger.error("Failed to import data")
             sys.exit(1)
+
+        # Refresh nearby venues for the new data
+        try:
+            compute_location_neighbors()
+        except Exception as e:
+            logger.error(f"Failed to compute location neighbors: {str(e)}")
+            sys.exit(1)
             
         logger.info("Import completed successfully")
         sys.exit(0) 
\ No newline at end of file
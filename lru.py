@@ -0,0 +1,66 @@
+"""
+Thread-safe LRU cache shared by the per-worker caches.
+
+Entries are evicted least recently used first once the cache holds more
+than max_entries of them, or once their total size (as measured by sizeof)
+exceeds max_bytes. With ttl_seconds, an entry older than that is treated as
+missing and dropped the next time it is read.
+"""
+import time
+import threading
+from collections import OrderedDict
+
+
+class LRUCache:
+    """Bounded LRU with optional entry, byte and time-to-live limits."""
+
+    def __init__(self, max_entries=None, max_bytes=None, ttl_seconds=None, sizeof=len):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self.size = 0
+        self._sizeof = sizeof if max_bytes is not None else (lambda value: 0)
+        # key -> (stored_at, size, value)
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        # Does not count as a use, and may still hold an expired entry
+        return key in self._entries
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            stored_at, size, value = entry
+            if self.ttl_seconds is not None and time.monotonic() - stored_at > self.ttl_seconds:
+                del self._entries[key]
+                self.size -= size
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        size = self._sizeof(value)
+        if self.max_bytes is not None and size > self.max_bytes:
+            # Storing it would evict everything else and still not fit
+            return
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self.size -= previous[1]
+            self._entries[key] = (time.monotonic(), size, value)
+            self.size += size
+            while ((self.max_entries is not None and len(self._entries) > self.max_entries)
+                   or (self.max_bytes is not None and self.size > self.max_bytes)):
+                _, (_, evicted_size, _) = self._entries.popitem(last=False)
+                self.size -= evicted_size
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.size = 0
@@ -0,0 +1,176 @@
+"""
+Server-side grid clustering of map markers.
+
+Markers are clustered per Web Mercator tile (the same z/x/y scheme Google
+Maps uses): each tile is split into a fixed grid and every grid cell with
+more than one location becomes a single cluster marker. Because cells are
+aligned to tiles, the clusters for a bounding box are just the union of the
+clusters of the tiles it covers, so results are cached per tile and shared
+between every map view that touches it.
+"""
+import math
+from sqlalchemy import text
+from lru import LRUCache
+
+MAX_ZOOM = 21
+MAX_LATITUDE = 85.05112878  # Web Mercator cut-off
+
+# Grid cells per tile side; 256px tiles / 4 gives clusters roughly 64px apart
+CELLS_PER_TILE = 4
+
+TILE_CLUSTERS_SQL = text("""
+    SELECT floor((longitude + 180.0) / 360.0 * :cells) AS cell_x,
+           floor((1.0 - ln(tan(radians(latitude)) + 1.0 / cos(radians(latitude))) / pi()) / 2.0 * :cells) AS cell_y,
+           count(*) AS count,
+           avg(latitude) AS latitude,
+           avg(longitude) AS longitude,
+           min(slug) AS slug,
+           min(business_name) AS business_name
+    FROM locations
+    WHERE latitude >= :south AND latitude < :north
+      AND longitude >= :west AND longitude < :east
+    GROUP BY cell_x, cell_y
+""")
+
+
+def lon_to_tile_x(lon, zoom):
+    n = 2 ** zoom
+    return min(n - 1, max(0, int((lon + 180.0) / 360.0 * n)))
+
+
+def lat_to_tile_y(lat, zoom):
+    n = 2 ** zoom
+    lat = max(-MAX_LATITUDE, min(MAX_LATITUDE, lat))
+    lat_rad = math.radians(lat)
+    y = (1.0 - math.log(math.tan(lat_rad) + 1.0 / math.cos(lat_rad)) / math.pi) / 2.0 * n
+    return min(n - 1, max(0, int(y)))
+
+
+def tile_bounds(zoom, x, y):
+    """Return (west, south, east, north) of a tile in degrees."""
+    n = 2 ** zoom
+
+    def tile_lat(ty):
+        return math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * ty / n))))
+
+    west = x / n * 360.0 - 180.0
+    east = (x + 1) / n * 360.0 - 180.0
+    north = tile_lat(y) if y > 0 else 90.0
+    south = tile_lat(y + 1) if y + 1 < n else -90.0
+    return west, south, east, north
+
+
+def parse_bbox(value):
+    """Parse 'west,south,east,north'. Raises ValueError on malformed input."""
+    parts = [float(part) for part in value.split(',')]
+    if len(parts) != 4:
+        raise ValueError("bbox must be 'west,south,east,north'")
+    west, south, east, north = parts
+    if not (-180 <= west <= 180 and -180 <= east <= 180 and -90 <= south <= north <= 90):
+        raise ValueError("bbox is out of range")
+    return west, south, east, north
+
+
+def parse_zoom(value):
+    """
+    Parse a map zoom level, rounding fractional zooms down.
+
+    Vector maps and pinch zoom report fractional levels such as '11.5'.
+    Raises ValueError on malformed input or a zoom outside 0..MAX_ZOOM.
+    """
+    zoom = float(value)
+    if not math.isfinite(zoom):
+        raise ValueError("zoom must be a number")
+    zoom = math.floor(zoom)
+    if not 0 <= zoom <= MAX_ZOOM:
+        raise ValueError(f"zoom must be between 0 and {MAX_ZOOM}")
+    return zoom
+
+
+def tiles_for_bbox(bbox, zoom, max_tiles):
+    """
+    List the (x, y) tiles covering a bbox, splitting at the antimeridian.
+
+    Returns None if the bbox needs more than max_tiles tiles at this zoom.
+    """
+    west, south, east, north = bbox
+    spans = [(west, east)] if west <= east else [(west, 180.0), (-180.0, east)]
+    y_range = range(lat_to_tile_y(north, zoom), lat_to_tile_y(south, zoom) + 1)
+    x_ranges = [range(lon_to_tile_x(span_west, zoom), lon_to_tile_x(span_east, zoom) + 1)
+                for span_west, span_east in spans]
+    if sum(len(x_range) for x_range in x_ranges) * len(y_range) > max_tiles:
+        return None
+    return [(x, y) for x_range in x_ranges for x in x_range for y in y_range]
+
+
+def parse_marker_request(args, max_tiles):
+    """
+    The (zoom, tiles) a ?bbox=west,south,east,north&zoom=z request needs.
+
+    Raises ValueError with a message for the client on bad input.
+    """
+    try:
+        bbox = parse_bbox(args.get('bbox', ''))
+        zoom = parse_zoom(args.get('zoom', ''))
+    except ValueError as e:
+        raise ValueError(f"Invalid bbox or zoom: {str(e)}") from e
+    tiles = tiles_for_bbox(bbox, zoom, max_tiles)
+    if tiles is None:
+        raise ValueError('bbox is too large for this zoom level')
+    return zoom, tiles
+
+
+def cached_tile_markers(cache, zoom, tiles):
+    """Markers of the cached tiles, and the (x, y) tiles still to be queried."""
+    markers, missing = [], []
+    for x, y in tiles:
+        tile_markers = cache.get((zoom, x, y))
+        if tile_markers is None:
+            missing.append((x, y))
+        else:
+            markers.extend(tile_markers)
+    return markers, missing
+
+
+def store_tile_markers(cache, zoom, x, y, rows):
+    """Turn a tile's TILE_CLUSTERS_SQL rows into markers and cache them."""
+    tile_markers = rows_to_markers(rows)
+    cache.set((zoom, x, y), tile_markers)
+    return tile_markers
+
+
+def tile_query_params(zoom, x, y):
+    west, south, east, north = tile_bounds(zoom, x, y)
+    return {
+        'cells': (2 ** zoom) * CELLS_PER_TILE,
+        'west': west, 'south': south, 'east': east, 'north': north
+    }
+
+
+def rows_to_markers(rows):
+    """Turn TILE_CLUSTERS_SQL rows into JSON-ready marker dicts."""
+    markers = []
+    for row in rows:
+        if row.count == 1:
+            markers.append({
+                'type': 'location',
+                'slug': row.slug,
+                'title': row.business_name,
+                'lat': float(row.latitude),
+                'lng': float(row.longitude)
+            })
+        else:
+            markers.append({
+                'type': 'cluster',
+                'count': row.count,
+                'lat': float(row.latitude),
+                'lng': float(row.longitude)
+            })
+    return markers
+
+
+class TileCache(LRUCache):
+    """Thread-safe LRU of per-tile marker lists with a time-to-live."""
+
+    def __init__(self, max_entries=10000, ttl_seconds=300):
+        super().__init__(max_entries=max_entries, ttl_seconds=ttl_seconds)
@@ -1,10 +1,14 @@
 from app import app, db
 from app import Location  # Import your models
+from partitions import ensure_states
 
 def init_db():
     with app.app_context():
         # Create all tables
         db.create_all()
+
+        # Seed the states lookup and create a locations partition for each
+        ensure_states(db.session.connection())
         
         # Commit the changes
         db.session.commit()
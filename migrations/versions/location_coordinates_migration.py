@@ -0,0 +1,28 @@
+"""numeric location coordinates
+
+Revision ID: location_coordinates_migration
+Revises: sync_runs_migration
+Create Date: 2026-10-19 10:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'location_coordinates_migration'
+down_revision = 'sync_runs_migration'
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    # Generated from the "(lat,lon)" string so every writer keeps them in sync
+    op.add_column('locations', sa.Column('latitude', sa.Float(),
+        sa.Computed("split_part(btrim(location, '()'), ',', 1)::double precision", persisted=True)))
+    op.add_column('locations', sa.Column('longitude', sa.Float(),
+        sa.Computed("split_part(btrim(location, '()'), ',', 2)::double precision", persisted=True)))
+    op.create_index('idx_locations_lat_lon', 'locations', ['latitude', 'longitude'])
+
+def downgrade():
+    op.drop_index('idx_locations_lat_lon', table_name='locations')
+    op.drop_column('locations', 'longitude')
+    op.drop_column('locations', 'latitude')
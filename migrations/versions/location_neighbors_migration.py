@@ -0,0 +1,34 @@
+"""location neighbors
+
+Revision ID: location_neighbors_migration
+Revises: location_coordinates_migration
+Create Date: 2026-10-19 11:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision = 'location_neighbors_migration'
+down_revision = 'location_coordinates_migration'
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    op.create_table('location_neighbors',
+        sa.Column('location_id', postgresql.UUID(), nullable=False),
+        sa.Column('rank', sa.SmallInteger(), nullable=False),
+        sa.Column('neighbor_id', postgresql.UUID(), nullable=False),
+        sa.Column('distance_km', sa.Float(), nullable=False),
+        sa.Column('subtype_similarity', sa.Float(), nullable=False),
+        sa.ForeignKeyConstraint(['location_id'], ['locations.id'], ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['neighbor_id'], ['locations.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('location_id', 'rank')
+    )
+    # Lets deleting a venue find the rows that point at it
+    op.create_index('idx_location_neighbors_neighbor_id', 'location_neighbors', ['neighbor_id'])
+
+def downgrade():
+    op.drop_index('idx_location_neighbors_neighbor_id', table_name='location_neighbors')
+    op.drop_table('location_neighbors')
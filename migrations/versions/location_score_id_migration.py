@@ -0,0 +1,29 @@
+"""id tiebreaker on the score indexes
+
+Revision ID: location_score_id_migration
+Revises: location_slugs_migration
+Create Date: 2026-10-19 18:00:00.000000
+
+Listings order by score DESC, id so venues with equal scores keep a stable
+order across pages; the score indexes gain id to serve that order.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'location_score_id_migration'
+down_revision = 'location_slugs_migration'
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    op.drop_index('idx_locations_city_score', table_name='locations')
+    op.drop_index('idx_locations_score', table_name='locations')
+    op.create_index('idx_locations_score', 'locations', [sa.text('score DESC'), 'id'])
+    op.create_index('idx_locations_city_score', 'locations', [sa.text('lower(city)'), sa.text('score DESC'), 'id'])
+
+def downgrade():
+    op.drop_index('idx_locations_city_score', table_name='locations')
+    op.drop_index('idx_locations_score', table_name='locations')
+    op.create_index('idx_locations_score', 'locations', [sa.text('score DESC')])
+    op.create_index('idx_locations_city_score', 'locations', [sa.text('lower(city)'), sa.text('score DESC')])
@@ -0,0 +1,42 @@
+"""location ranking score
+
+Revision ID: location_score_migration
+Revises: location_neighbors_migration
+Create Date: 2026-10-19 12:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'location_score_migration'
+down_revision = 'location_neighbors_migration'
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    for stars in range(1, 6):
+        op.add_column('locations', sa.Column(f'reviews_per_score_{stars}', sa.Integer()))
+    op.add_column('locations', sa.Column('score', sa.Float(), nullable=False, server_default=sa.text('0')))
+
+    # Backfill with the default prior (mean 4.0, weight 10); the review histogram
+    # is only filled by the next import or sync, so use rating and reviews_count
+    op.execute("""
+        UPDATE locations
+        SET score = CASE
+            WHEN rating IS NOT NULL AND reviews_count > 0
+                THEN (10 * 4.0 + rating * reviews_count) / (10 + reviews_count)
+            ELSE 4.0
+        END
+    """)
+
+    op.create_index('idx_locations_score', 'locations', [sa.text('score DESC')])
+    op.create_index('idx_locations_state_city_score', 'locations',
+                    ['state', sa.text('lower(city)'), sa.text('score DESC')])
+
+def downgrade():
+    op.drop_index('idx_locations_state_city_score', table_name='locations')
+    op.drop_index('idx_locations_score', table_name='locations')
+    op.drop_column('locations', 'score')
+    for stars in range(1, 6):
+        op.drop_column('locations', f'reviews_per_score_{stars}')
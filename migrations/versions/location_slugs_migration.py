@@ -0,0 +1,42 @@
+"""global slug registry and neighbor partition keys
+
+Revision ID: location_slugs_migration
+Revises: location_state_partitions_migration
+Create Date: 2026-10-19 16:00:00.000000
+
+locations can only enforce (slug, state) uniqueness, so location_slugs
+holds every slug once with the state whose partition has it; slug lookups
+read it first so they only scan that partition. location_neighbors gains
+the neighbor's state for the same reason.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'location_slugs_migration'
+down_revision = 'location_state_partitions_migration'
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    op.create_table('location_slugs',
+        sa.Column('slug', sa.Text(), nullable=False),
+        sa.Column('state', sa.String(length=2), nullable=False),
+        sa.ForeignKeyConstraint(['state'], ['states.code']),
+        sa.PrimaryKeyConstraint('slug')
+    )
+    # Fails if two states already share a slug; rename one of them first
+    op.execute("INSERT INTO location_slugs (slug, state) SELECT slug, state FROM locations")
+
+    op.add_column('location_neighbors', sa.Column('neighbor_state', sa.String(length=2)))
+    op.execute("""
+        UPDATE location_neighbors n SET neighbor_state = l.state
+        FROM locations l WHERE l.id = n.neighbor_id
+    """)
+    # Rows pointing at a venue that no longer exists are dropped by the next recompute anyway
+    op.execute("DELETE FROM location_neighbors WHERE neighbor_state IS NULL")
+    op.alter_column('location_neighbors', 'neighbor_state', nullable=False)
+
+def downgrade():
+    op.drop_column('location_neighbors', 'neighbor_state')
+    op.drop_table('location_slugs')
@@ -0,0 +1,181 @@
+"""states lookup and locations partitioned by state
+
+Revision ID: location_state_partitions_migration
+Revises: location_score_migration
+Create Date: 2026-10-19 14:00:00.000000
+
+Replaces the state_code ENUM with a states lookup table and rebuilds
+locations as a LIST-partitioned table with one partition per state.
+Indexes are declared on the parent, so Postgres creates them on every
+partition. Needs PostgreSQL 13+ for row triggers on partitioned tables.
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision = 'location_state_partitions_migration'
+down_revision = 'location_score_migration'
+branch_labels = None
+depends_on = None
+
+# A deliberate snapshot of partitions.NORTH_AMERICA when this revision was
+# written: migrations must not change when application code does, so states
+# added later are seeded by ensure_states or `flask add-state`, not here.
+STATES = (
+    ('AL', 'Alabama', 'US'), ('AK', 'Alaska', 'US'), ('AZ', 'Arizona', 'US'),
+    ('AR', 'Arkansas', 'US'), ('CA', 'California', 'US'), ('CO', 'Colorado', 'US'),
+    ('CT', 'Connecticut', 'US'), ('DE', 'Delaware', 'US'), ('DC', 'District of Columbia', 'US'),
+    ('FL', 'Florida', 'US'), ('GA', 'Georgia', 'US'), ('HI', 'Hawaii', 'US'),
+    ('ID', 'Idaho', 'US'), ('IL', 'Illinois', 'US'), ('IN', 'Indiana', 'US'),
+    ('IA', 'Iowa', 'US'), ('KS', 'Kansas', 'US'), ('KY', 'Kentucky', 'US'),
+    ('LA', 'Louisiana', 'US'), ('ME', 'Maine', 'US'), ('MD', 'Maryland', 'US'),
+    ('MA', 'Massachusetts', 'US'), ('MI', 'Michigan', 'US'), ('MN', 'Minnesota', 'US'),
+    ('MS', 'Mississippi', 'US'), ('MO', 'Missouri', 'US'), ('MT', 'Montana', 'US'),
+    ('NE', 'Nebraska', 'US'), ('NV', 'Nevada', 'US'), ('NH', 'New Hampshire', 'US'),
+    ('NJ', 'New Jersey', 'US'), ('NM', 'New Mexico', 'US'), ('NY', 'New York', 'US'),
+    ('NC', 'North Carolina', 'US'), ('ND', 'North Dakota', 'US'), ('OH', 'Ohio', 'US'),
+    ('OK', 'Oklahoma', 'US'), ('OR', 'Oregon', 'US'), ('PA', 'Pennsylvania', 'US'),
+    ('RI', 'Rhode Island', 'US'), ('SC', 'South Carolina', 'US'), ('SD', 'South Dakota', 'US'),
+    ('TN', 'Tennessee', 'US'), ('TX', 'Texas', 'US'), ('UT', 'Utah', 'US'),
+    ('VT', 'Vermont', 'US'), ('VA', 'Virginia', 'US'), ('WA', 'Washington', 'US'),
+    ('WV', 'West Virginia', 'US'), ('WI', 'Wisconsin', 'US'), ('WY', 'Wyoming', 'US'),
+    ('AB', 'Alberta', 'CA'), ('BC', 'British Columbia', 'CA'), ('MB', 'Manitoba', 'CA'),
+    ('NB', 'New Brunswick', 'CA'), ('NL', 'Newfoundland and Labrador', 'CA'),
+    ('NS', 'Nova Scotia', 'CA'), ('NT', 'Northwest Territories', 'CA'), ('NU', 'Nunavut', 'CA'),
+    ('ON', 'Ontario', 'CA'), ('PE', 'Prince Edward Island', 'CA'), ('QC', 'Quebec', 'CA'),
+    ('SK', 'Saskatchewan', 'CA'), ('YT', 'Yukon', 'CA'),
+)
+
+# Every column but the generated latitude/longitude, for copying rows between tables
+COPY_COLUMNS = (
+    'id, business_name, address, city, state, zip_code, phone, website, description, hours, slug, '
+    'created_at, updated_at, rating, reviews_count, reviews_link, reviews_per_score_1, '
+    'reviews_per_score_2, reviews_per_score_3, reviews_per_score_4, reviews_per_score_5, '
+    'score, location, location_metadata'
+)
+
+OLD_INDEXES = ('idx_locations_business_name', 'idx_locations_city', 'idx_locations_state',
+               'idx_locations_rating', 'idx_locations_lat_lon', 'idx_locations_score',
+               'idx_locations_state_city_score')
+
+
+def _location_columns(state_column):
+    return [
+        sa.Column('id', postgresql.UUID(), server_default=sa.text('gen_random_uuid()'), nullable=False),
+        sa.Column('business_name', sa.Text(), nullable=False),
+        sa.Column('address', sa.Text(), nullable=False),
+        sa.Column('city', sa.Text(), nullable=False),
+        state_column,
+        sa.Column('zip_code', sa.String(length=10), nullable=False),
+        sa.Column('phone', sa.String(length=20)),
+        sa.Column('website', sa.Text()),
+        sa.Column('description', sa.Text()),
+        sa.Column('hours', postgresql.JSONB()),
+        sa.Column('slug', sa.Text(), nullable=False),
+        sa.Column('created_at', postgresql.TIMESTAMP(timezone=True), server_default=sa.text('CURRENT_TIMESTAMP'), nullable=False),
+        sa.Column('updated_at', postgresql.TIMESTAMP(timezone=True), server_default=sa.text('CURRENT_TIMESTAMP'), nullable=False),
+        sa.Column('rating', postgresql.NUMERIC(3, 2)),
+        sa.Column('reviews_count', sa.Integer()),
+        sa.Column('reviews_link', sa.Text()),
+        *[sa.Column(f'reviews_per_score_{stars}', sa.Integer()) for stars in range(1, 6)],
+        sa.Column('score', sa.Float(), nullable=False, server_default=sa.text('0')),
+        sa.Column('location', sa.String(50)),
+        sa.Column('location_metadata', postgresql.JSONB()),
+        sa.Column('latitude', sa.Float(),
+                  sa.Computed("split_part(btrim(location, '()'), ',', 1)::double precision", persisted=True)),
+        sa.Column('longitude', sa.Float(),
+                  sa.Computed("split_part(btrim(location, '()'), ',', 2)::double precision", persisted=True)),
+    ]
+
+
+def _set_aside_locations():
+    """Rename locations out of the way and free the index and constraint names it holds."""
+    op.execute("ALTER TABLE locations RENAME TO locations_previous")
+    for constraint in ('locations_pkey', 'locations_slug_key', 'locations_slug_excl', 'locations_slug_state_key'):
+        op.execute(f"ALTER TABLE locations_previous DROP CONSTRAINT IF EXISTS {constraint}")
+    for index in OLD_INDEXES + ('idx_locations_city_score',):
+        op.execute(f"DROP INDEX IF EXISTS {index}")
+
+
+def _create_updated_at_trigger():
+    op.execute("""
+        CREATE TRIGGER update_locations_updated_at
+            BEFORE UPDATE ON locations
+            FOR EACH ROW
+            EXECUTE FUNCTION update_updated_at_column();
+    """)
+
+
+def upgrade():
+    states = op.create_table('states',
+        sa.Column('code', sa.String(length=2), nullable=False),
+        sa.Column('name', sa.Text(), nullable=False),
+        sa.Column('country', sa.String(length=2), server_default='US', nullable=False),
+        sa.PrimaryKeyConstraint('code')
+    )
+    op.bulk_insert(states, [{'code': code, 'name': name, 'country': country} for code, name, country in STATES])
+
+    # Foreign keys can't point at a partitioned table's id alone
+    op.drop_constraint('location_neighbors_location_id_fkey', 'location_neighbors', type_='foreignkey')
+    op.drop_constraint('location_neighbors_neighbor_id_fkey', 'location_neighbors', type_='foreignkey')
+
+    _set_aside_locations()
+
+    op.create_table('locations',
+        *_location_columns(sa.Column('state', sa.String(length=2), nullable=False)),
+        sa.ForeignKeyConstraint(['state'], ['states.code']),
+        # Unique constraints on a partitioned table must include the partition key
+        sa.PrimaryKeyConstraint('id', 'state', name='locations_pkey'),
+        sa.UniqueConstraint('slug', 'state', name='locations_slug_state_key'),
+        postgresql_partition_by='LIST (state)'
+    )
+    for code, _, _ in STATES:
+        op.execute(f"CREATE TABLE locations_{code.lower()} PARTITION OF locations FOR VALUES IN ('{code}')")
+
+    # Declared on the parent, created on each partition; state is constant
+    # within a partition, so it no longer leads the city index
+    op.create_index('idx_locations_business_name', 'locations', ['business_name'])
+    op.create_index('idx_locations_rating', 'locations', ['rating'])
+    op.create_index('idx_locations_lat_lon', 'locations', ['latitude', 'longitude'])
+    op.create_index('idx_locations_score', 'locations', [sa.text('score DESC')])
+    op.create_index('idx_locations_city_score', 'locations', [sa.text('lower(city)'), sa.text('score DESC')])
+    _create_updated_at_trigger()
+
+    op.execute(f"INSERT INTO locations ({COPY_COLUMNS}) "
+               f"SELECT {COPY_COLUMNS.replace('state,', 'state::text,')} FROM locations_previous")
+    op.drop_table('locations_previous')
+    op.execute("DROP TYPE state_code")
+
+
+def downgrade():
+    codes = [code for (code,) in op.get_bind().execute(sa.text("SELECT code FROM states ORDER BY code"))]
+    op.execute("CREATE TYPE state_code AS ENUM ({})".format(', '.join(f"'{code}'" for code in codes)))
+
+    _set_aside_locations()
+
+    op.create_table('locations',
+        *_location_columns(sa.Column('state', postgresql.ENUM(name='state_code', create_type=False), nullable=False)),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('slug')
+    )
+    op.create_index('idx_locations_business_name', 'locations', ['business_name'])
+    op.create_index('idx_locations_city', 'locations', ['city'])
+    op.create_index('idx_locations_state', 'locations', ['state'])
+    op.create_index('idx_locations_rating', 'locations', ['rating'])
+    op.create_index('idx_locations_lat_lon', 'locations', ['latitude', 'longitude'])
+    op.create_index('idx_locations_score', 'locations', [sa.text('score DESC')])
+    op.create_index('idx_locations_state_city_score', 'locations',
+                    ['state', sa.text('lower(city)'), sa.text('score DESC')])
+    _create_updated_at_trigger()
+
+    op.execute(f"INSERT INTO locations ({COPY_COLUMNS}) "
+               f"SELECT {COPY_COLUMNS.replace('state,', 'state::state_code,')} FROM locations_previous")
+    # Drops every partition with it
+    op.drop_table('locations_previous')
+    op.drop_table('states')
+
+    op.create_foreign_key('location_neighbors_location_id_fkey', 'location_neighbors', 'locations',
+                          ['location_id'], ['id'], ondelete='CASCADE')
+    op.create_foreign_key('location_neighbors_neighbor_id_fkey', 'location_neighbors', 'locations',
+                          ['neighbor_id'], ['id'], ondelete='CASCADE')
@@ -0,0 +1,37 @@
+"""sync runs history
+
+Revision ID: sync_runs_migration
+Revises: postgres_native_migration
+Create Date: 2026-10-19 09:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision = 'sync_runs_migration'
+down_revision = 'postgres_native_migration'
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    op.create_table('sync_runs',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('started_at', postgresql.TIMESTAMP(timezone=True), server_default=sa.text('CURRENT_TIMESTAMP'), nullable=False),
+        sa.Column('finished_at', postgresql.TIMESTAMP(timezone=True)),
+        sa.Column('status', sa.String(length=20), nullable=False),
+        sa.Column('rows_read', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('inserted', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('updated', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('errors', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('duration_seconds', sa.Float()),
+        sa.Column('rows_per_second', sa.Float()),
+        sa.Column('message', sa.Text()),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('idx_sync_runs_started_at', 'sync_runs', ['started_at'])
+
+def downgrade():
+    op.drop_index('idx_sync_runs_started_at', table_name='sync_runs')
+    op.drop_table('sync_runs')
@@ -0,0 +1,137 @@
+"""
+Batch computation of nearby and similar venues.
+
+Coordinates are bucketed into a lat/lon grid, and the k nearest venues of
+every point are found with vectorized haversine distances against the points
+of the surrounding cells only, widening the search ring where venues are
+sparse. That keeps the job near-linear in the number of venues instead of
+comparing every pair. Candidates are then re-ranked by distance discounted by
+how similar their Google subtypes are.
+"""
+import math
+import numpy as np
+
+EARTH_RADIUS_KM = 6371.0088
+KM_PER_DEGREE = math.pi * EARTH_RADIUS_KM / 180.0
+
+# How much a perfect subtype match shortens the effective distance when ranking
+SIMILARITY_WEIGHT = 0.5
+
+
+def haversine_km(lat1, lon1, lat2, lon2):
+    """Great-circle distance in km between points given in radians (broadcasts)."""
+    a = (np.sin((lat2 - lat1) / 2.0) ** 2
+         + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2.0) ** 2)
+    return 2.0 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+
+def nearest_neighbors(latitudes, longitudes, k, cell_degrees=0.5, max_matrix=4_000_000):
+    """
+    Find the k nearest other points of every point.
+
+    Returns (indices, distances_km), both of shape (n, k); rows of points with
+    fewer than k other points are padded with -1 and inf.
+    """
+    latitudes = np.asarray(latitudes, dtype=np.float64)
+    longitudes = np.asarray(longitudes, dtype=np.float64)
+    n = len(latitudes)
+    indices = np.full((n, k), -1, dtype=np.int64)
+    distances = np.full((n, k), np.inf)
+    if n < 2 or k < 1:
+        return indices, distances
+
+    lat_rad, lon_rad = np.radians(latitudes), np.radians(longitudes)
+    cell_rows = np.floor(latitudes / cell_degrees).astype(np.int64)
+    cell_cols = np.floor(longitudes / cell_degrees).astype(np.int64)
+
+    cells = {}
+    order = np.lexsort((cell_cols, cell_rows))
+    boundaries = np.flatnonzero(np.diff(cell_rows[order]) | np.diff(cell_cols[order])) + 1
+    for members in np.split(order, boundaries):
+        cells[(cell_rows[members[0]], cell_cols[members[0]])] = members
+    max_ring = int(math.ceil(360.0 / cell_degrees))
+    wanted = min(k, n - 1)
+
+    for (row, col), members in cells.items():
+        ring = 1
+        while True:
+            candidates = np.concatenate(_cells_in_ring(cells, row, col, ring))
+            # Anything outside the ring is at least this far from every member
+            edge_lat = min(89.9, (abs(row) + ring + 1) * cell_degrees)
+            guaranteed_km = ring * cell_degrees * KM_PER_DEGREE * math.cos(math.radians(edge_lat))
+            if len(candidates) > wanted or ring >= max_ring:
+                cell_indices, cell_distances = _nearest_in(members, candidates, lat_rad, lon_rad,
+                                                           wanted, max_matrix)
+                if ring >= max_ring or np.all(cell_distances[:, wanted - 1] <= guaranteed_km):
+                    break
+            ring *= 2
+
+        indices[members, :wanted] = cell_indices
+        distances[members, :wanted] = cell_distances
+
+    return indices, distances
+
+
+def _cells_in_ring(cells, row, col, ring):
+    if (2 * ring + 1) ** 2 > len(cells):
+        return [members for (r, c), members in cells.items()
+                if abs(r - row) <= ring and abs(c - col) <= ring]
+    return [cells[(r, c)]
+            for r in range(row - ring, row + ring + 1)
+            for c in range(col - ring, col + ring + 1)
+            if (r, c) in cells]
+
+
+def _nearest_in(members, candidates, lat_rad, lon_rad, k, max_matrix):
+    found_indices = np.empty((len(members), k), dtype=np.int64)
+    found_distances = np.empty((len(members), k))
+    chunk = max(1, max_matrix // len(candidates))
+    for start in range(0, len(members), chunk):
+        rows = members[start:start + chunk]
+        matrix = haversine_km(lat_rad[rows, None], lon_rad[rows, None],
+                              lat_rad[None, candidates], lon_rad[None, candidates])
+        matrix[rows[:, None] == candidates[None, :]] = np.inf
+        nearest = np.argpartition(matrix, k - 1, axis=1)[:, :k]
+        nearest_distances = np.take_along_axis(matrix, nearest, axis=1)
+        by_distance = np.argsort(nearest_distances, axis=1)
+        found_indices[start:start + chunk] = candidates[np.take_along_axis(nearest, by_distance, axis=1)]
+        found_distances[start:start + chunk] = np.take_along_axis(nearest_distances, by_distance, axis=1)
+    return found_indices, found_distances
+
+
+def subtype_set(subtypes):
+    """Normalize a location_metadata 'subtypes' value into a set of lowercase names."""
+    if not subtypes:
+        return frozenset()
+    if isinstance(subtypes, str):
+        subtypes = subtypes.split(',')
+    return frozenset(s.strip().lower() for s in subtypes if s and s.strip())
+
+
+def subtype_similarity(a, b):
+    """Jaccard similarity of two subtype sets."""
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+
+def related_venues(latitudes, longitudes, subtypes, k, **options):
+    """
+    Rank the k nearest venues of every venue by distance and subtype similarity.
+
+    Yields (index, rank, neighbor_index, distance_km, similarity) tuples with
+    rank starting at 1 for the most relevant neighbor.
+    """
+    subtype_sets = [subtype_set(s) for s in subtypes]
+    indices, distances = nearest_neighbors(latitudes, longitudes, k, **options)
+    for i in range(len(indices)):
+        related = []
+        for neighbor, distance in zip(indices[i], distances[i]):
+            if neighbor < 0:
+                break
+            similarity = subtype_similarity(subtype_sets[i], subtype_sets[neighbor])
+            related.append((distance * (1.0 - SIMILARITY_WEIGHT * similarity), int(neighbor),
+                            float(distance), similarity))
+        related.sort()
+        for rank, (_, neighbor, distance, similarity) in enumerate(related, start=1):
+            yield i, rank, neighbor, distance, similarity
@@ -0,0 +1,146 @@
+"""
+LIST partitions of the locations table, one per state or province.
+
+The states lookup table holds the codes a location may use, and every code
+has its own partition, locations_<code>. Queries that filter on state only
+touch that partition and its indexes. A state is re-imported by loading a
+staging table shaped like locations and swapping it in with DETACH/ATTACH
+PARTITION, so other states are never touched (unlike TRUNCATE ... CASCADE).
+Slugs must be unique across states, which the location_slugs registry
+enforces and which slug lookups use to pick the partition to read.
+"""
+import re
+from sqlalchemy import MetaData, text
+
+# (code, name, country) rows the lookup is seeded with; add more with `flask add-state`
+NORTH_AMERICA = (
+    ('AL', 'Alabama', 'US'), ('AK', 'Alaska', 'US'), ('AZ', 'Arizona', 'US'),
+    ('AR', 'Arkansas', 'US'), ('CA', 'California', 'US'), ('CO', 'Colorado', 'US'),
+    ('CT', 'Connecticut', 'US'), ('DE', 'Delaware', 'US'), ('DC', 'District of Columbia', 'US'),
+    ('FL', 'Florida', 'US'), ('GA', 'Georgia', 'US'), ('HI', 'Hawaii', 'US'),
+    ('ID', 'Idaho', 'US'), ('IL', 'Illinois', 'US'), ('IN', 'Indiana', 'US'),
+    ('IA', 'Iowa', 'US'), ('KS', 'Kansas', 'US'), ('KY', 'Kentucky', 'US'),
+    ('LA', 'Louisiana', 'US'), ('ME', 'Maine', 'US'), ('MD', 'Maryland', 'US'),
+    ('MA', 'Massachusetts', 'US'), ('MI', 'Michigan', 'US'), ('MN', 'Minnesota', 'US'),
+    ('MS', 'Mississippi', 'US'), ('MO', 'Missouri', 'US'), ('MT', 'Montana', 'US'),
+    ('NE', 'Nebraska', 'US'), ('NV', 'Nevada', 'US'), ('NH', 'New Hampshire', 'US'),
+    ('NJ', 'New Jersey', 'US'), ('NM', 'New Mexico', 'US'), ('NY', 'New York', 'US'),
+    ('NC', 'North Carolina', 'US'), ('ND', 'North Dakota', 'US'), ('OH', 'Ohio', 'US'),
+    ('OK', 'Oklahoma', 'US'), ('OR', 'Oregon', 'US'), ('PA', 'Pennsylvania', 'US'),
+    ('RI', 'Rhode Island', 'US'), ('SC', 'South Carolina', 'US'), ('SD', 'South Dakota', 'US'),
+    ('TN', 'Tennessee', 'US'), ('TX', 'Texas', 'US'), ('UT', 'Utah', 'US'),
+    ('VT', 'Vermont', 'US'), ('VA', 'Virginia', 'US'), ('WA', 'Washington', 'US'),
+    ('WV', 'West Virginia', 'US'), ('WI', 'Wisconsin', 'US'), ('WY', 'Wyoming', 'US'),
+    ('AB', 'Alberta', 'CA'), ('BC', 'British Columbia', 'CA'), ('MB', 'Manitoba', 'CA'),
+    ('NB', 'New Brunswick', 'CA'), ('NL', 'Newfoundland and Labrador', 'CA'),
+    ('NS', 'Nova Scotia', 'CA'), ('NT', 'Northwest Territories', 'CA'), ('NU', 'Nunavut', 'CA'),
+    ('ON', 'Ontario', 'CA'), ('PE', 'Prince Edward Island', 'CA'), ('QC', 'Quebec', 'CA'),
+    ('SK', 'Saskatchewan', 'CA'), ('YT', 'Yukon', 'CA'),
+)
+
+_STATE_CODE = re.compile(r'^[A-Z]{2}$')
+
+
+def is_state_code(code):
+    """Whether code is shaped like a state or province code ('OR', 'BC')."""
+    return bool(code) and bool(_STATE_CODE.match(code))
+
+
+def load_state_codes(connection):
+    """Map every known state code, and its name (casefolded), to the code."""
+    codes = {}
+    for code, name in connection.execute(text("SELECT code, name FROM states")):
+        codes[code] = code
+        codes[' '.join(name.split()).casefold()] = code
+    return codes
+
+
+def to_state_code(value, codes):
+    """
+    The state code for a code or full name ('OR', 'or', 'Oregon', 'New York').
+
+    codes comes from load_state_codes. Returns None for anything that is not
+    a known state, so 'New York' never lands in a partition by its prefix.
+    """
+    value = ' '.join(str(value or '').split())
+    if len(value) == 2:
+        return codes.get(value.upper())
+    return codes.get(value.casefold())
+
+
+def partition_name(code):
+    # Codes end up in DDL, so only ever accept two capital letters
+    if not is_state_code(code):
+        raise ValueError(f"Invalid state code: {code!r}")
+    return f"locations_{code.lower()}"
+
+
+def ensure_state_partition(connection, code):
+    """Create the locations partition of a state if it does not exist yet."""
+    connection.execute(text(
+        f"CREATE TABLE IF NOT EXISTS {partition_name(code)} PARTITION OF locations FOR VALUES IN ('{code}')"
+    ))
+
+
+def ensure_states(connection, states=NORTH_AMERICA):
+    """Seed the states lookup and create a partition for every code in it."""
+    connection.execute(
+        text("INSERT INTO states (code, name, country) VALUES (:code, :name, :country) "
+             "ON CONFLICT (code) DO NOTHING"),
+        [{'code': code, 'name': name, 'country': country} for code, name, country in states]
+    )
+    for (code,) in connection.execute(text("SELECT code FROM states ORDER BY code")):
+        ensure_state_partition(connection, code)
+
+
+def create_staging_partition(connection, code):
+    """
+    Create an empty staging table for a state, built LIKE locations with its indexes.
+
+    It is constrained to the state so ATTACH can skip its validation scan.
+    Returns the staging table name.
+    """
+    partition = partition_name(code)
+    staging = f"{partition}_staging"
+    connection.execute(text(f"DROP TABLE IF EXISTS {staging}"))
+    connection.execute(text(f"CREATE TABLE {staging} (LIKE locations INCLUDING ALL)"))
+    connection.execute(text(f"ALTER TABLE {staging} ADD CONSTRAINT {partition}_state_check CHECK (state = '{code}')"))
+    return staging
+
+
+def staging_table(table, staging):
+    """A copy of the locations Table that inserts into the staging table."""
+    return table.to_metadata(MetaData(), name=staging)
+
+
+def swap_in_staging_partition(connection, code):
+    """
+    Replace the partition of a state with its loaded staging table.
+
+    The state's rows in the location_slugs registry are rebuilt from the
+    staging table first, so a slug already taken by another state fails the
+    swap instead of being stored twice.
+    """
+    partition = partition_name(code)
+    ensure_state_partition(connection, code)
+    connection.execute(text("DELETE FROM location_slugs WHERE state = :code"), {'code': code})
+    connection.execute(text(f"INSERT INTO location_slugs (slug, state) SELECT slug, state FROM {partition}_staging"))
+    connection.execute(text(f"ALTER TABLE locations DETACH PARTITION {partition}"))
+    connection.execute(text(f"DROP TABLE {partition}"))
+    connection.execute(text(f"ALTER TABLE {partition}_staging RENAME TO {partition}"))
+    connection.execute(text(f"ALTER TABLE locations ATTACH PARTITION {partition} FOR VALUES IN ('{code}')"))
+
+
+def replace_state_partition(connection, table, code, rows):
+    """
+    Replace every location of one state with rows (dicts of column values).
+
+    Only the detach/attach swap at the end locks the parent table. The load
+    and the index builds happen on a staging table that no query can see
+    yet. Run it inside a transaction so readers see either the old partition
+    or the new one.
+    """
+    staging = create_staging_partition(connection, code)
+    if rows:
+        connection.execute(staging_table(table, staging).insert(), rows)
+    swap_in_staging_partition(connection, code)
@@ -0,0 +1,245 @@
+"""
+On-demand request profiling.
+
+With PROFILING_ENABLED set, ProfilingMiddleware wraps the WSGI app. A
+request carrying a valid signed token, in the X-Profile-Token header or the
+_profile query parameter, runs under cProfile while a sampler thread records
+its call stacks. The SQL statements it executes are timed, and a sample taken
+during a statement gets the statement as its innermost frame, so queries show
+up in the flamegraph. Three files are written to PROFILE_DIR:
+
+- <id>.prof    pstats dump (snakeviz, flameprof, pstats)
+- <id>.folded  collapsed stacks (flamegraph.pl, speedscope)
+- <id>.json    timings, SQL statements and the top functions
+
+The response carries X-Profile-Id and a Server-Timing header, and is sent
+with Cache-Control: no-store; the app sees PROFILED_ENVIRON_KEY in the WSGI
+environ and keeps the page out of its caches. Without the
+setting nothing is installed, so requests pay nothing. With it, requests
+without a token pay one header lookup, plus a context variable check per
+SQL statement.
+"""
+import os
+import re
+import sys
+import json
+import time
+import pstats
+import cProfile
+import threading
+import contextvars
+from datetime import datetime
+from collections import Counter
+from urllib.parse import parse_qs
+from itsdangerous import URLSafeTimedSerializer, BadSignature
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+TOKEN_SALT = 'request-profile'
+# Set in the WSGI environ of a request that is being profiled
+PROFILED_ENVIRON_KEY = 'profiling.profiled'
+
+_active = contextvars.ContextVar('active_profile', default=None)
+_listeners_installed = False
+
+
+def make_token(secret_key):
+    """A signed token that lets a request be profiled."""
+    return URLSafeTimedSerializer(secret_key, salt=TOKEN_SALT).dumps('profile')
+
+
+def token_is_valid(secret_key, token, max_age):
+    try:
+        URLSafeTimedSerializer(secret_key, salt=TOKEN_SALT).loads(token, max_age=max_age)
+        return True
+    except BadSignature:
+        return False
+
+
+def is_profiled(environ):
+    """Whether ProfilingMiddleware is profiling the request with this environ."""
+    return environ.get(PROFILED_ENVIRON_KEY, False)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    profile = _active.get()
+    if profile is not None:
+        profile.sql_started(statement)
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    profile = _active.get()
+    if profile is not None:
+        profile.sql_finished(statement, cursor.rowcount)
+
+
+def install_sql_timing():
+    """Time SQL statements of profiled requests on every engine (idempotent)."""
+    global _listeners_installed
+    if not _listeners_installed:
+        event.listen(Engine, 'before_cursor_execute', _before_cursor_execute)
+        event.listen(Engine, 'after_cursor_execute', _after_cursor_execute)
+        _listeners_installed = True
+
+
+def _frame_label(code):
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+def _sql_label(statement):
+    return 'SQL ' + re.sub(r'\s+', ' ', statement).replace(';', ',').strip()[:120]
+
+
+class Profile:
+    """cProfile, stack samples and SQL timings of one piece of work on one thread."""
+
+    def __init__(self, sample_interval=0.001):
+        self.sample_interval = sample_interval
+        self.profiler = cProfile.Profile()
+        self.samples = Counter()
+        self.sql = []
+        self.started = self.elapsed = None
+        self._thread_id = None
+        self._sql_statement = None
+        self._sql_started = None
+        self._stop = threading.Event()
+        self._sampler = None
+        self._token = None
+
+    def __enter__(self):
+        self._thread_id = threading.get_ident()
+        self._token = _active.set(self)
+        self._sampler = threading.Thread(target=self._sample, name='request-profile-sampler', daemon=True)
+        self._sampler.start()
+        self.started = time.perf_counter()
+        self.profiler.enable()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.profiler.disable()
+        self.elapsed = time.perf_counter() - self.started
+        self._stop.set()
+        self._sampler.join()
+        _active.reset(self._token)
+
+    def sql_started(self, statement):
+        self._sql_statement = statement
+        self._sql_started = time.perf_counter()
+
+    def sql_finished(self, statement, rowcount):
+        if self._sql_started is not None:
+            self.sql.append((statement, (time.perf_counter() - self._sql_started) * 1000, rowcount))
+        self._sql_statement = self._sql_started = None
+
+    @property
+    def sql_ms(self):
+        return sum(ms for _, ms, _ in self.sql)
+
+    def _sample(self):
+        while not self._stop.wait(self.sample_interval):
+            frame = sys._current_frames().get(self._thread_id)
+            stack = []
+            while frame is not None:
+                stack.append(_frame_label(frame.f_code))
+                frame = frame.f_back
+            stack.reverse()
+            if self._sql_statement is not None:
+                stack.append(_sql_label(self._sql_statement))
+            if stack:
+                self.samples[';'.join(stack)] += 1
+
+    def stats(self):
+        return pstats.Stats(self.profiler)
+
+    def top_functions(self, limit=25, sort='cumulative'):
+        stats = self.stats()
+        stats.sort_stats(sort)
+        rows = []
+        for function in stats.fcn_list[:limit]:
+            primitive_calls, calls, total_time, cumulative_time, _ = stats.stats[function]
+            filename, line, name = function
+            rows.append({'function': f"{name} ({filename}:{line})", 'calls': calls,
+                         'tottime_ms': total_time * 1000, 'cumtime_ms': cumulative_time * 1000})
+        return rows
+
+    def sql_summary(self):
+        """SQL statements grouped by text, slowest total first."""
+        grouped = {}
+        for statement, ms, _ in self.sql:
+            entry = grouped.setdefault(statement, {'statement': statement, 'count': 0, 'total_ms': 0.0})
+            entry['count'] += 1
+            entry['total_ms'] += ms
+        return sorted(grouped.values(), key=lambda entry: entry['total_ms'], reverse=True)
+
+    def save(self, directory, name, **details):
+        """Write <name>.prof, <name>.folded and <name>.json to directory; returns the base path."""
+        os.makedirs(directory, exist_ok=True)
+        base = os.path.join(directory, name)
+        self.profiler.dump_stats(f"{base}.prof")
+        with open(f"{base}.folded", 'w') as folded:
+            for stack, count in self.samples.most_common():
+                folded.write(f"{stack} {count}\n")
+        with open(f"{base}.json", 'w') as summary:
+            json.dump({
+                **details,
+                'elapsed_ms': self.elapsed * 1000,
+                'sql_ms': self.sql_ms,
+                'sql': [{'statement': statement, 'ms': ms, 'rows': rows} for statement, ms, rows in self.sql],
+                'top_functions': self.top_functions(),
+            }, summary, indent=2, default=str)
+        return base
+
+
+class ProfilingMiddleware:
+    """Profile WSGI requests that carry a valid token; pass everything else straight through."""
+
+    def __init__(self, app, secret_key, profile_dir, token_max_age=3600, sample_interval=0.001):
+        self.app = app
+        self.secret_key = secret_key
+        self.profile_dir = profile_dir
+        self.token_max_age = token_max_age
+        self.sample_interval = sample_interval
+        install_sql_timing()
+
+    def _token(self, environ):
+        token = environ.get('HTTP_X_PROFILE_TOKEN')
+        if token is None and '_profile=' in environ.get('QUERY_STRING', ''):
+            token = parse_qs(environ['QUERY_STRING']).get('_profile', [None])[0]
+        return token
+
+    def __call__(self, environ, start_response):
+        token = self._token(environ)
+        if token is None or not token_is_valid(self.secret_key, token, self.token_max_age):
+            return self.app(environ, start_response)
+        return self._profiled(environ, start_response)
+
+    def _profiled(self, environ, start_response):
+        path = environ.get('PATH_INFO', '/')
+        name = "{}-{}-{}".format(datetime.utcnow().strftime('%Y%m%dT%H%M%S%f'), environ.get('REQUEST_METHOD', 'GET'),
+                                 re.sub(r'[^A-Za-z0-9]+', '-', path).strip('-') or 'root')
+        profile = Profile(self.sample_interval)
+        status_line = []
+        environ[PROFILED_ENVIRON_KEY] = True
+
+        def profiled_start_response(status, headers, exc_info=None):
+            status_line.append(status)
+            # Profiled responses carry per-request timings and must never be reused
+            headers = [(key, value) for key, value in headers if key.lower() != 'cache-control'] + [
+                ('Cache-Control', 'no-store'),
+                ('X-Profile-Id', name),
+                ('Server-Timing', f'app;dur={(time.perf_counter() - profile.started) * 1000:.1f}, '
+                                  f'sql;dur={profile.sql_ms:.1f};desc="{len(profile.sql)} queries"'),
+            ]
+            return start_response(status, headers, exc_info)
+
+        # The body is iterated inside the profile so streamed responses are covered too
+        with profile:
+            app_iter = self.app(environ, profiled_start_response)
+            try:
+                for chunk in app_iter:
+                    yield chunk
+            finally:
+                if hasattr(app_iter, 'close'):
+                    app_iter.close()
+        profile.save(self.profile_dir, name, method=environ.get('REQUEST_METHOD'), path=path,
+                     query=environ.get('QUERY_STRING', ''), status=status_line[0] if status_line else None)
@@ -0,0 +1,257 @@
+"""
+Columnar snapshots of the locations table.
+
+A snapshot is one Parquet file (or Arrow IPC file, for zero-copy reads)
+holding every location in normalized, typed columns:
+
+- hours is the stored JSON value as text, so a dict, a list or a raw
+  string from the sheet all come back unchanged;
+- location_metadata is split into type, subtypes, photos_count, place_id,
+  google_id and last_synced columns;
+- coordinates are latitude/longitude doubles.
+
+Analytics can query the file directly (pandas, DuckDB, Spark) instead of
+the primary database. Rows are written in batches as they stream from a
+server-side cursor, so memory use stays flat however large the table is.
+The states lookup travels in the file's schema metadata so a fresh
+database can be restored from the file alone.
+
+Loading never turns rows into Python objects: each Arrow batch is written
+as CSV and sent with COPY into a temporary table shaped like the file, and
+one INSERT ... SELECT per state rebuilds the locations columns in Postgres.
+"""
+import io
+import json
+import uuid
+import itertools
+from datetime import timezone
+import pyarrow as pa
+import pyarrow.csv as pa_csv
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+
+FORMATS = ('parquet', 'arrow')
+
+SCHEMA = pa.schema([
+    ('id', pa.string()),
+    ('business_name', pa.string()),
+    ('address', pa.string()),
+    ('city', pa.string()),
+    ('state', pa.string()),
+    ('zip_code', pa.string()),
+    ('phone', pa.string()),
+    ('website', pa.string()),
+    ('description', pa.string()),
+    ('hours', pa.string()),
+    ('slug', pa.string()),
+    ('created_at', pa.timestamp('us', tz='UTC')),
+    ('updated_at', pa.timestamp('us', tz='UTC')),
+    ('rating', pa.float64()),
+    ('reviews_count', pa.int32()),
+    ('reviews_link', pa.string()),
+    ('reviews_per_score_1', pa.int32()),
+    ('reviews_per_score_2', pa.int32()),
+    ('reviews_per_score_3', pa.int32()),
+    ('reviews_per_score_4', pa.int32()),
+    ('reviews_per_score_5', pa.int32()),
+    ('score', pa.float64()),
+    ('latitude', pa.float64()),
+    ('longitude', pa.float64()),
+    ('type', pa.string()),
+    ('subtypes', pa.list_(pa.string())),
+    ('photos_count', pa.int32()),
+    ('place_id', pa.string()),
+    ('google_id', pa.string()),
+    ('last_synced', pa.string()),
+])
+
+# Columns copied as-is between a locations row and a snapshot row
+PLAIN_COLUMNS = ('business_name', 'address', 'city', 'state', 'zip_code', 'phone', 'website',
+                 'description', 'slug', 'created_at', 'updated_at', 'reviews_count', 'reviews_link',
+                 'reviews_per_score_1', 'reviews_per_score_2', 'reviews_per_score_3',
+                 'reviews_per_score_4', 'reviews_per_score_5', 'score')
+METADATA_FIELDS = ('type', 'subtypes', 'photos_count', 'place_id', 'google_id', 'last_synced')
+
+
+def snapshot_row(row):
+    """Normalize a locations row (a mapping of column values) into a snapshot row."""
+    metadata = row.get('location_metadata') or {}
+    subtypes = metadata.get('subtypes')
+    if isinstance(subtypes, str):
+        subtypes = subtypes.split(',')
+    record = {column: row.get(column) for column in PLAIN_COLUMNS}
+    record.update(
+        id=str(row['id']),
+        hours=json.dumps(row['hours']) if row.get('hours') is not None else None,
+        rating=float(row['rating']) if row.get('rating') is not None else None,
+        latitude=row.get('latitude'),
+        longitude=row.get('longitude'),
+        type=metadata.get('type'),
+        subtypes=[str(s).strip() for s in subtypes] if subtypes else None,
+        photos_count=metadata.get('photos_count'),
+        place_id=metadata.get('place_id'),
+        google_id=metadata.get('google_id'),
+        last_synced=metadata.get('last_synced'),
+    )
+    return record
+
+
+def location_row(record):
+    """Turn a snapshot row back into locations column values."""
+    row = {column: record.get(column) for column in PLAIN_COLUMNS}
+    hours = record.get('hours')
+    row.update(
+        id=uuid.UUID(record['id']),
+        hours=json.loads(hours) if hours is not None else None,
+        rating=record.get('rating'),
+        location=(f"({record['latitude']},{record['longitude']})"
+                  if record.get('latitude') is not None and record.get('longitude') is not None else None),
+        location_metadata={field: record.get(field) for field in METADATA_FIELDS},
+    )
+    if row['location_metadata']['subtypes'] is None:
+        row['location_metadata']['subtypes'] = []
+    return row
+
+
+class SnapshotWriter:
+    """
+    Write snapshot rows to a Parquet or Arrow file, one batch at a time.
+
+    Parquet files are zstd-compressed; Arrow files are left uncompressed so
+    readers can memory-map them without a decode step.
+    """
+
+    def __init__(self, path, states=(), format='parquet'):
+        if format not in FORMATS:
+            raise ValueError(f"Unknown snapshot format: {format}")
+        self.schema = SCHEMA.with_metadata({'states': json.dumps([list(state) for state in states])})
+        self.rows = 0
+        self._sink = None
+        if format == 'parquet':
+            self._writer = pq.ParquetWriter(path, self.schema, compression='zstd')
+        else:
+            self._sink = pa.OSFile(path, 'wb')
+            self._writer = pa.ipc.new_file(self._sink, self.schema)
+
+    def write(self, rows):
+        """Append one batch (a row group in Parquet) of snapshot rows."""
+        if rows:
+            self._writer.write_batch(pa.RecordBatch.from_pylist(rows, schema=self.schema))
+            self.rows += len(rows)
+
+    def close(self):
+        self._writer.close()
+        if self._sink is not None:
+            self._sink.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def snapshot_format(path):
+    return 'arrow' if path.endswith(('.arrow', '.feather', '.ipc')) else 'parquet'
+
+
+def open_snapshot(path, batch_size=50_000):
+    """
+    Open a snapshot for streaming.
+
+    Returns (states, record_batches): the (code, name, country) rows of the
+    states lookup, and an iterator of Arrow RecordBatches.
+    """
+    if snapshot_format(path) == 'arrow':
+        reader = pa.ipc.open_file(pa.memory_map(path))
+        schema = reader.schema
+        record_batches = (reader.get_batch(i) for i in range(reader.num_record_batches))
+    else:
+        parquet_file = pq.ParquetFile(path)
+        schema = parquet_file.schema_arrow
+        record_batches = parquet_file.iter_batches(batch_size=batch_size)
+    states = [tuple(state) for state in json.loads((schema.metadata or {}).get(b'states', b'[]'))]
+    return states, record_batches
+
+
+def read_snapshot(path, batch_size=50_000):
+    """Like open_snapshot, but batches are lists of snapshot rows."""
+    states, record_batches = open_snapshot(path, batch_size)
+    return states, (batch_records(batch) for batch in record_batches)
+
+
+def _column_values(column):
+    if pa.types.is_timestamp(column.type):
+        # Converting tz-aware timestamps value by value is several times slower
+        return [value.replace(tzinfo=timezone.utc) if value else None
+                for value in column.cast(pa.timestamp('us')).to_pylist()]
+    if pa.types.is_map(column.type):
+        offsets, keys, items = column.offsets.to_pylist(), column.keys.to_pylist(), column.items.to_pylist()
+        return [dict(zip(keys[offsets[i]:offsets[i + 1]], items[offsets[i]:offsets[i + 1]])) if valid else None
+                for i, valid in enumerate(column.is_valid().to_pylist())]
+    if pa.types.is_string(column.type) or (column.null_count == 0 and
+                                            (pa.types.is_integer(column.type) or pa.types.is_floating(column.type))):
+        # Much faster than to_pylist; string nulls come back as None
+        return column.to_numpy(zero_copy_only=False).tolist()
+    return column.to_pylist()
+
+
+def batch_records(batch):
+    """Snapshot rows of a RecordBatch, converted column by column."""
+    columns = [_column_values(batch.column(i)) for i in range(batch.num_columns)]
+    return [dict(zip(batch.schema.names, values)) for values in zip(*columns)]
+
+
+# Loading through COPY
+
+LOAD_TABLE = 'snapshot_load'
+# Joins subtypes into one CSV field; Google category names never contain it
+SUBTYPES_SEPARATOR = '\x1f'
+SUBTYPES_SEPARATOR_SQL = "E'\\x1f'"
+
+_PG_TYPES = {pa.string(): 'text', pa.float64(): 'double precision', pa.int32(): 'integer',
+             pa.timestamp('us', tz='UTC'): 'timestamptz', pa.list_(pa.string()): 'text'}
+
+CREATE_LOAD_TABLE_SQL = (f"CREATE TEMPORARY TABLE IF NOT EXISTS {LOAD_TABLE} ("
+                         + ', '.join(f"{field.name} {_PG_TYPES[field.type]}" for field in SCHEMA)
+                         + ")")
+COPY_SQL = f"COPY {LOAD_TABLE} ({', '.join(SCHEMA.names)}) FROM STDIN WITH (FORMAT csv)"
+
+
+def insert_from_load_table_sql(table):
+    """INSERT ... SELECT that rebuilds locations columns from LOAD_TABLE, as location_row does."""
+    columns = ('id',) + PLAIN_COLUMNS + ('hours', 'rating', 'location', 'location_metadata')
+    metadata = ', '.join(
+        f"'subtypes', coalesce(to_jsonb(string_to_array(subtypes, {SUBTYPES_SEPARATOR_SQL})), '[]'::jsonb)"
+        if field == 'subtypes' else f"'{field}', {field}"
+        for field in METADATA_FIELDS
+    )
+    return (
+        f"INSERT INTO {table} ({', '.join(columns)}) "
+        f"SELECT id::uuid, {', '.join(PLAIN_COLUMNS)}, hours::jsonb, rating, "
+        f"CASE WHEN latitude IS NOT NULL AND longitude IS NOT NULL "
+        f"THEN '(' || latitude || ',' || longitude || ')' END, "
+        f"jsonb_build_object({metadata}) "
+        f"FROM {LOAD_TABLE}"
+    )
+
+
+def state_slices(batch):
+    """Split a RecordBatch into (state, slice) runs of consecutive rows of one state."""
+    states = batch.column(batch.schema.get_field_index('state')).to_pylist()
+    start = 0
+    for state, run in itertools.groupby(states):
+        length = sum(1 for _ in run)
+        yield state, batch.slice(start, length)
+        start += length
+
+
+def batch_csv(batch):
+    """A RecordBatch as headerless CSV in SCHEMA column order, ready for COPY_SQL."""
+    columns = [pc.binary_join(column, SUBTYPES_SEPARATOR) if name == 'subtypes' else column
+               for name, column in zip(batch.schema.names, batch.columns)]
+    batch = pa.RecordBatch.from_arrays(columns, names=batch.schema.names)
+    sink = io.BytesIO()
+    pa_csv.write_csv(batch, sink, pa_csv.WriteOptions(include_header=False))
+    sink.seek(0)
+    return sink
@@ -0,0 +1,41 @@
+"""
+Helpers for streaming long listing pages.
+
+The rows of a listing come from a server-side cursor and the page is
+rendered with Flask's stream_template, so the header and the first cards are
+sent while later rows are still being fetched. Jinja yields output in many
+tiny pieces; buffered() regroups them into chunks worth a network write
+(and worth compressing on their own).
+"""
+
+
+class ReplayableRows:
+    """
+    Wrap a one-shot row iterator so a template can loop over it more than once.
+
+    The first loop pulls rows from the cursor as the page renders and keeps
+    them; later loops (e.g. the JSON-LD list after the cards) replay them.
+    """
+
+    def __init__(self, rows):
+        self._rows = iter(rows)
+        self._seen = []
+
+    def __iter__(self):
+        yield from self._seen
+        for row in self._rows:
+            self._seen.append(row)
+            yield row
+
+
+def buffered(chunks, min_size=8192):
+    """Join small str chunks into pieces of at least min_size characters."""
+    pending, size = [], 0
+    for chunk in chunks:
+        pending.append(chunk)
+        size += len(chunk)
+        if size >= min_size:
+            yield ''.join(pending)
+            pending, size = [], 0
+    if pending:
+        yield ''.join(pending)
@@ -0,0 +1,156 @@
+"""
+In-memory prefix index for search box suggestions.
+
+Keys (business names and "City, ST" labels, accent and case folded) are kept
+in one sorted list, so every prefix matches a contiguous range found with
+bisect. To get the most popular matches of a range without scanning it, the
+list is cut into fixed-size blocks whose top results are precomputed; a
+query only scans the partial blocks at both ends of its range and merges the
+stored top lists of the full blocks in between. The shortest prefixes, whose
+ranges cover most of the index, are answered from a precomputed table.
+"""
+import heapq
+import logging
+import threading
+import time
+import unicodedata
+from bisect import bisect_left
+
+logger = logging.getLogger(__name__)
+
+_DROPPED = {"'", "’", "."}
+
+
+def fold(text):
+    """Accent- and case-fold text for prefix matching: "Bogey's Café" -> "bogeys cafe"."""
+    decomposed = unicodedata.normalize('NFKD', text)
+    chars = []
+    for ch in decomposed:
+        if unicodedata.combining(ch) or ch in _DROPPED:
+            continue
+        chars.append(ch if ch.isalnum() else ' ')
+    return ' '.join(''.join(chars).casefold().split())
+
+
+class SuggestIndex:
+    """Immutable prefix index over (label, score, payload) entries."""
+
+    def __init__(self, entries, max_results=20, block_size=256, precomputed_prefix_length=2):
+        self.max_results = max_results
+        self.block_size = block_size
+
+        keyed = [(fold(label), score, payload) for label, score, payload in entries]
+        keyed = [entry for entry in keyed if entry[0]]
+        keyed.sort(key=lambda entry: entry[0])
+        self._keys = [entry[0] for entry in keyed]
+        self._scores = [entry[1] for entry in keyed]
+        self._payloads = [entry[2] for entry in keyed]
+
+        score_of = self._scores.__getitem__
+        self._block_tops = [
+            heapq.nlargest(max_results, range(start, min(start + block_size, len(self._keys))), key=score_of)
+            for start in range(0, len(self._keys), block_size)
+        ]
+
+        self._prefix_tops = {}
+        for length in range(1, precomputed_prefix_length + 1):
+            for prefix in {key[:length] for key in self._keys if len(key) >= length}:
+                lo, hi = self._range(prefix)
+                self._prefix_tops[prefix] = self._range_top(lo, hi, max_results)
+
+    def __len__(self):
+        return len(self._keys)
+
+    def _range(self, prefix):
+        lo = bisect_left(self._keys, prefix)
+        hi = bisect_left(self._keys, prefix + '\U0010ffff', lo)
+        return lo, hi
+
+    def _range_top(self, lo, hi, limit):
+        first_block = -(-lo // self.block_size)
+        last_block = hi // self.block_size
+        if first_block >= last_block:
+            candidates = range(lo, hi)
+        else:
+            candidates = list(range(lo, first_block * self.block_size))
+            candidates.extend(range(last_block * self.block_size, hi))
+            for block in range(first_block, last_block):
+                candidates.extend(self._block_tops[block])
+        return heapq.nlargest(limit, candidates, key=self._scores.__getitem__)
+
+    def search(self, query, limit=8):
+        prefix = fold(query)
+        if not prefix:
+            return []
+        limit = min(limit, self.max_results)
+        top = self._prefix_tops.get(prefix)
+        if top is None:
+            top = self._range_top(*self._range(prefix), limit)
+        return [self._payloads[i] for i in top[:limit]]
+
+
+class RefreshingSuggestIndex:
+    """
+    Holds the current SuggestIndex and rebuilds it when the data changes.
+
+    load_entries() returns the index entries and load_version() a cheap value
+    that changes whenever they do. warm() builds the index when a worker
+    starts. Searches never wait on the database: while there is no index
+    (warm failed or has not run) they return no results and start a build
+    in a background thread, and once there is one the version is polled at
+    most every refresh_seconds, also from a background thread.
+    """
+
+    def __init__(self, load_entries, load_version, refresh_seconds=60, **index_options):
+        self._load_entries = load_entries
+        self._load_version = load_version
+        self.refresh_seconds = refresh_seconds
+        self._index_options = index_options
+        self._index = None
+        self._version = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+        self._refreshing = False
+
+    def _build(self, version):
+        started = time.monotonic()
+        index = SuggestIndex(self._load_entries(), **self._index_options)
+        self._index, self._version = index, version
+        logger.info(f"Built suggest index with {len(index)} entries in {time.monotonic() - started:.2f}s")
+
+    def _refresh_if_changed(self):
+        try:
+            version = self._load_version()
+            if self._index is None or version != self._version:
+                self._build(version)
+        except Exception as e:
+            logger.error(f"Error refreshing suggest index: {str(e)}")
+        finally:
+            self._refreshing = False
+
+    def _refresh_in_background(self):
+        with self._lock:
+            if not self._refreshing:
+                self._refreshing = True
+                self._checked_at = time.monotonic()
+                threading.Thread(target=self._refresh_if_changed, daemon=True).start()
+
+    def warm(self):
+        """Build the index now so the first search finds it; if this fails, search() retries."""
+        # The lock is only held to claim the build, so concurrent searches never wait on it
+        with self._lock:
+            if self._index is not None or self._refreshing:
+                return
+            self._refreshing = True
+            self._checked_at = time.monotonic()
+        self._refresh_if_changed()
+
+    def search(self, query, limit=8):
+        index = self._index
+        if index is None:
+            # Never build inline: under the ASGI app that would block the event loop
+            self._refresh_in_background()
+            return []
+        if time.monotonic() - self._checked_at > self.refresh_seconds:
+            self._refresh_in_background()
+        return index.search(query, limit)
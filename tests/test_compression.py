@@ -0,0 +1,133 @@
+import os
+import sys
+import gzip
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import brotli
+import pytest
+from flask import Flask, Response, make_response, request
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from compression import (CompressedCache, compress, compress_stream, compress_response,  # noqa: E402
+                         INLINE, BEST)
+
+PAGE = ''.join(f'<li>Venue {i} in Portland, OR</li>' for i in range(500))
+
+DECOMPRESS = {'gzip': gzip.decompress, 'br': brotli.decompress}
+
+
+def make_app(cache):
+    app = Flask(__name__)
+
+    @app.route('/page')
+    def page():
+        response = make_response(PAGE)
+        response.cache_control.public = True
+        return response
+
+    @app.route('/api')
+    def api():
+        return {'venues': [f'Venue {i}' for i in range(200)]}
+
+    @app.route('/stream')
+    def stream():
+        return Response((f'<p>{i}</p>' * 50 for i in range(5)), mimetype='text/html')
+
+    @app.route('/small')
+    def small():
+        return 'ok'
+
+    @app.after_request
+    def compress_after(response):
+        return compress_response(response, request, cache, min_size=500)
+
+    return app
+
+
+@pytest.fixture
+def cache():
+    return CompressedCache(recompress=False)
+
+
+@pytest.mark.parametrize('encoding', ['gzip', 'br'])
+def test_compress_round_trip(encoding):
+    data = PAGE.encode()
+    for level in (INLINE, BEST):
+        assert DECOMPRESS[encoding](compress(data, encoding, level)) == data
+
+
+@pytest.mark.parametrize('encoding', ['gzip', 'br'])
+def test_stream_round_trip(encoding):
+    chunks = ['<p>one</p>', b'<p>two</p>', '', '<p>three</p>']
+    compressed = b''.join(compress_stream(chunks, encoding))
+    assert DECOMPRESS[encoding](compressed) == b'<p>one</p><p>two</p><p>three</p>'
+
+
+@pytest.mark.parametrize('path', ['/page', '/api', '/stream'])
+@pytest.mark.parametrize('encoding', ['gzip', 'br'])
+def test_responses_are_compressed_with_the_accepted_encoding(cache, path, encoding):
+    response = make_app(cache).test_client().get(path, headers={'Accept-Encoding': f'{encoding}, deflate'})
+    assert response.headers['Content-Encoding'] == encoding
+    assert 'Accept-Encoding' in response.headers['Vary']
+    body = DECOMPRESS[encoding](response.get_data())
+    assert body.startswith(b'<li>Venue 0') or body.startswith(b'{') or body.startswith(b'<p>0')
+
+
+def test_brotli_is_preferred_and_identity_is_left_alone(cache):
+    client = make_app(cache).test_client()
+    assert client.get('/page', headers={'Accept-Encoding': 'gzip, br'}).headers['Content-Encoding'] == 'br'
+
+    plain = client.get('/page', headers={'Accept-Encoding': 'identity'})
+    assert 'Content-Encoding' not in plain.headers
+    assert plain.get_data(as_text=True) == PAGE
+    assert 'Accept-Encoding' in plain.headers['Vary']
+
+    small = client.get('/small', headers={'Accept-Encoding': 'gzip'})
+    assert 'Content-Encoding' not in small.headers
+
+
+def test_cached_pages_get_an_etag_and_answer_304(cache):
+    client = make_app(cache).test_client()
+    first = client.get('/page', headers={'Accept-Encoding': 'gzip'})
+    etag = first.headers['ETag']
+    assert etag.startswith('W/"')
+    assert len(cache) == 1
+
+    again = client.get('/page', headers={'Accept-Encoding': 'gzip', 'If-None-Match': etag})
+    assert again.status_code == 304
+    assert again.get_data() == b''
+
+    # Only public HTML pages are hashed and cached
+    api = client.get('/api', headers={'Accept-Encoding': 'gzip'})
+    assert 'ETag' not in api.headers
+    assert len(cache) == 1
+
+
+def test_cache_misses_are_recompressed_in_the_background():
+    cache = CompressedCache()
+    data = PAGE.encode()
+    digest = cache.digest(data)
+    inline = cache.get_or_compress(digest, data, 'br')
+    assert inline == compress(data, 'br', INLINE)
+
+    cache._executor.shutdown(wait=True)
+    best = cache.get((digest, 'br'))
+    assert best == compress(data, 'br', BEST)
+    assert brotli.decompress(best) == data
+
+
+def test_background_recompression_skips_evicted_pages():
+    cache = CompressedCache()
+    # Hold the recompression thread until the page has been evicted
+    release = threading.Event()
+    cache._executor = ThreadPoolExecutor(max_workers=1)
+    cache._executor.submit(release.wait)
+    data = PAGE.encode()
+    digest = cache.digest(data)
+    cache.get_or_compress(digest, data, 'gzip')
+    cache.clear()
+    release.set()
+    cache._executor.shutdown(wait=True)
+    assert (digest, 'gzip') not in cache
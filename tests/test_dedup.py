@@ -0,0 +1,59 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from dedup import resolve_identities, assign_slugs, merge_records  # noqa: E402
+from ranking import bayesian_score  # noqa: E402
+
+
+def record(name, place_id=None, zip_code='97201', city='Portland', slug=None,
+           latitude=45.52, longitude=-122.68):
+    return {'name': name, 'place_id': place_id, 'google_id': None, 'zip_code': zip_code,
+            'latitude': latitude, 'longitude': longitude, 'city': city, 'state': 'OR', 'slug': slug}
+
+
+def test_same_place_id_is_one_venue():
+    records = [record('Swing Lab', 'p1'), record('Swing Lab Studio', 'p1', zip_code='97230')]
+    assert list(resolve_identities(records).values()) == [[0, 1]]
+
+
+def test_similar_name_in_same_zip_is_one_venue():
+    records = [record('Fairway Lounge', 'p1'), record('Fairway Lounge.')]
+    assert list(resolve_identities(records).values()) == [[0, 1]]
+
+
+def test_different_place_ids_are_never_merged_by_name():
+    records = [record('Topgolf', 'p1'), record('Topgolf', 'p2')]
+    assert len(resolve_identities(records)) == 2
+
+
+def test_franchise_gets_city_then_state():
+    records = [record('Topgolf', 'p1'),
+               record('Topgolf', 'p2', zip_code='98101', city='Seattle', latitude=47.6, longitude=-122.3),
+               record('Topgolf', 'p3', zip_code='97230', latitude=45.55, longitude=-122.5)]
+    slugs = assign_slugs(records, resolve_identities(records))
+    assert sorted(slugs.values()) == ['topgolf-portland', 'topgolf-portland-or', 'topgolf-seattle']
+
+
+def test_every_stored_slug_in_a_cluster_stays_reserved():
+    records = [record('Topgolf', slug='topgolf'),
+               record('TopGolf', slug='topgolf-portland'),
+               record('Topgolf', 'p3', zip_code='97230', latitude=45.55, longitude=-122.5)]
+    clusters = resolve_identities(records)
+    assert list(clusters.values()) == [[0, 1], [2]]
+    slugs = assign_slugs(records, clusters)
+    assert slugs[0] == 'topgolf'
+    assert slugs[2] not in ('topgolf', 'topgolf-portland')
+
+
+def test_merged_record_is_rescored_from_its_merged_reviews():
+    stale = {'business_name': 'Swing Lab', 'rating': 4.8, 'reviews_count': 40, 'score': 4.0,
+             **{f'reviews_per_score_{stars}': None for stars in range(1, 6)}}
+    histogram = {'business_name': 'Swing Lab', 'rating': 4.0, 'reviews_count': 3, 'score': 4.0,
+                 'reviews_per_score_1': 0, 'reviews_per_score_2': 0, 'reviews_per_score_3': 0,
+                 'reviews_per_score_4': 0, 'reviews_per_score_5': 3}
+    merged = merge_records([histogram, stale], prior_mean=4.0, prior_weight=10)
+    assert merged['reviews_count'] == 40
+    assert merged['reviews_per_score_5'] == 3
+    assert merged['score'] == bayesian_score(4.8, 40, [0, 0, 0, 0, 3])
@@ -0,0 +1,40 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import lru  # noqa: E402
+from lru import LRUCache  # noqa: E402
+
+
+def test_evicts_least_recently_used_entry():
+    cache = LRUCache(max_entries=2)
+    cache.set('a', 1)
+    cache.set('b', 2)
+    cache.get('a')
+    cache.set('c', 3)
+    assert cache.get('b') is None
+    assert (cache.get('a'), cache.get('c')) == (1, 3)
+
+
+def test_byte_limit_counts_value_sizes():
+    cache = LRUCache(max_bytes=10)
+    cache.set('a', b'xxxx')
+    cache.set('b', b'xxxx')
+    cache.set('a', b'xxxxxx')
+    assert cache.size == 10
+    cache.set('c', b'xx')
+    assert cache.get('b') is None and cache.size == 8
+    cache.set('huge', b'x' * 11)
+    assert cache.get('huge') is None and len(cache) == 2
+
+
+def test_expired_entries_are_dropped(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(lru.time, 'monotonic', lambda: now[0])
+    cache = LRUCache(ttl_seconds=5)
+    cache.set('a', 1)
+    now[0] += 4
+    assert cache.get('a') == 1
+    now[0] += 2
+    assert cache.get('a') is None and len(cache) == 0
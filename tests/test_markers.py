@@ -0,0 +1,85 @@
+import os
+import sys
+from collections import namedtuple
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from markers import (parse_bbox, parse_zoom, tiles_for_bbox, tile_bounds, parse_marker_request,  # noqa: E402
+                     cached_tile_markers, store_tile_markers, TileCache, MAX_ZOOM)
+
+Row = namedtuple('Row', 'count latitude longitude slug business_name')
+
+
+@pytest.mark.parametrize('value', ['', '1,2,3', '1,2,3,4,5', 'a,b,c,d', '-190,0,10,10', '0,10,10,5', '0,-91,10,10'])
+def test_parse_bbox_rejects_malformed_and_out_of_range(value):
+    with pytest.raises(ValueError):
+        parse_bbox(value)
+
+
+def test_parse_bbox_accepts_whole_world():
+    assert parse_bbox('-180,-90,180,90') == (-180, -90, 180, 90)
+
+
+@pytest.mark.parametrize('value, zoom', [('11', 11), ('11.5', 11), ('0.9', 0), (str(MAX_ZOOM), MAX_ZOOM)])
+def test_parse_zoom_floors_fractional_levels(value, zoom):
+    assert parse_zoom(value) == zoom
+
+
+@pytest.mark.parametrize('value', ['', 'nan', 'inf', '-1', str(MAX_ZOOM + 1)])
+def test_parse_zoom_rejects_invalid_levels(value):
+    with pytest.raises(ValueError):
+        parse_zoom(value)
+
+
+def test_tiles_cover_the_bbox():
+    bbox = (-122.8, 45.4, -122.5, 45.6)
+    tiles = tiles_for_bbox(bbox, 10, 64)
+    assert tiles
+    west = min(tile_bounds(10, x, y)[0] for x, y in tiles)
+    east = max(tile_bounds(10, x, y)[2] for x, y in tiles)
+    south = min(tile_bounds(10, x, y)[1] for x, y in tiles)
+    north = max(tile_bounds(10, x, y)[3] for x, y in tiles)
+    assert west <= bbox[0] and east >= bbox[2] and south <= bbox[1] and north >= bbox[3]
+
+
+def test_zoom_zero_is_one_tile():
+    assert tiles_for_bbox((-180, -90, 180, 90), 0, 1) == [(0, 0)]
+
+
+def test_antimeridian_bbox_is_split_into_both_edges():
+    tiles = tiles_for_bbox((170, -10, -170, 10), 3, 64)
+    xs = sorted({x for x, _ in tiles})
+    assert xs == [0, 7]
+
+
+def test_too_many_tiles_returns_none():
+    bbox = (-125, 25, -65, 50)
+    assert tiles_for_bbox(bbox, 8, 64) is None
+    assert len(tiles_for_bbox(bbox, 4, 64)) <= 64
+
+
+def test_antimeridian_tiles_count_against_the_cap():
+    bbox = (90, -10, -90, 10)
+    count = len(tiles_for_bbox(bbox, 4, 1000))
+    assert tiles_for_bbox(bbox, 4, count - 1) is None
+
+
+def test_parse_marker_request_messages():
+    assert parse_marker_request({'bbox': '-180,-90,180,90', 'zoom': '0.5'}, 64) == (0, [(0, 0)])
+    with pytest.raises(ValueError, match='Invalid bbox or zoom'):
+        parse_marker_request({'bbox': '1,2', 'zoom': '3'}, 64)
+    with pytest.raises(ValueError, match='too large'):
+        parse_marker_request({'bbox': '-180,-90,180,90', 'zoom': '10'}, 64)
+
+
+def test_tile_markers_are_cached_per_tile():
+    cache = TileCache()
+    rows = [Row(1, 45.5, -122.6, 'swing-lab', 'Swing Lab'), Row(3, 45.4, -122.7, 'a', 'A')]
+    stored = store_tile_markers(cache, 10, 1, 2, rows)
+    assert stored == [{'type': 'location', 'slug': 'swing-lab', 'title': 'Swing Lab', 'lat': 45.5, 'lng': -122.6},
+                      {'type': 'cluster', 'count': 3, 'lat': 45.4, 'lng': -122.7}]
+    markers, missing = cached_tile_markers(cache, 10, [(1, 2), (1, 3)])
+    assert markers == stored
+    assert missing == [(1, 3)]
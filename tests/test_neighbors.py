@@ -0,0 +1,63 @@
+import os
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from neighbors import nearest_neighbors, haversine_km, related_venues, subtype_set  # noqa: E402
+
+
+def fixture_points():
+    rng = np.random.default_rng(7)
+    # A dense city, a looser region, and a few isolated venues that force the search ring to widen
+    city = rng.normal((45.52, -122.68), 0.05, size=(60, 2))
+    region = rng.uniform((44.0, -124.0), (48.0, -117.0), size=(40, 2))
+    isolated = np.array([[61.2, -149.9], [21.3, -157.8], [25.8, -80.2]])
+    points = np.vstack([city, region, isolated])
+    return points[:, 0], points[:, 1]
+
+
+def brute_force(latitudes, longitudes, k):
+    lat, lon = np.radians(latitudes), np.radians(longitudes)
+    matrix = haversine_km(lat[:, None], lon[:, None], lat[None, :], lon[None, :])
+    np.fill_diagonal(matrix, np.inf)
+    return np.sort(matrix, axis=1)[:, :k]
+
+
+@pytest.mark.parametrize('k, cell_degrees', [(1, 0.5), (5, 0.5), (10, 0.1), (10, 5.0)])
+def test_nearest_neighbors_match_brute_force(k, cell_degrees):
+    latitudes, longitudes = fixture_points()
+    indices, distances = nearest_neighbors(latitudes, longitudes, k, cell_degrees=cell_degrees)
+    np.testing.assert_allclose(distances, brute_force(latitudes, longitudes, k))
+
+    lat, lon = np.radians(latitudes), np.radians(longitudes)
+    for i in range(len(latitudes)):
+        assert i not in indices[i]
+        np.testing.assert_allclose(haversine_km(lat[i], lon[i], lat[indices[i]], lon[indices[i]]), distances[i])
+
+
+def test_small_inputs_are_padded():
+    indices, distances = nearest_neighbors([45.0, 45.1], [-122.0, -122.0], 3)
+    assert indices.tolist() == [[1, -1, -1], [0, -1, -1]]
+    assert np.isinf(distances[:, 1:]).all()
+    assert nearest_neighbors([45.0], [-122.0], 3)[0].tolist() == [[-1, -1, -1]]
+
+
+def test_related_venues_prefer_similar_subtypes_at_similar_distance():
+    latitudes = [45.0, 45.01, 45.0, 45.05]
+    longitudes = [-122.0, -122.0, -122.02, -122.0]
+    subtypes = [['Golf club', 'Indoor golf course'], ['Bar'], 'Indoor golf course, Golf club', None]
+    related = [row for row in related_venues(latitudes, longitudes, subtypes, 3) if row[0] == 0]
+
+    assert [rank for _, rank, _, _, _ in related] == [1, 2, 3]
+    # Venue 2 is a little farther than venue 1 but has the same subtypes
+    assert [neighbor for _, _, neighbor, _, _ in related] == [2, 1, 3]
+    assert related[0][4] == 1.0 and related[1][4] == 0.0
+    assert related[0][3] > related[1][3]
+
+
+def test_subtype_set_normalizes_lists_and_strings():
+    assert subtype_set('Golf club, Bar ,') == subtype_set(['golf club', 'BAR']) == {'golf club', 'bar'}
+    assert subtype_set(None) == frozenset()
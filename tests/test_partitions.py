@@ -0,0 +1,24 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from partitions import NORTH_AMERICA, to_state_code  # noqa: E402
+
+CODES = {**{code: code for code, _, _ in NORTH_AMERICA},
+         **{name.casefold(): code for code, name, _ in NORTH_AMERICA}}
+
+
+def test_codes_and_names_map_to_codes():
+    assert to_state_code('OR', CODES) == 'OR'
+    assert to_state_code(' wa ', CODES) == 'WA'
+    assert to_state_code('New York', CODES) == 'NY'
+    assert to_state_code('new  jersey', CODES) == 'NJ'
+    assert to_state_code('North Carolina', CODES) == 'NC'
+    assert to_state_code('Texas', CODES) == 'TX'
+
+
+def test_unknown_states_are_rejected():
+    assert to_state_code('NO', CODES) is None
+    assert to_state_code('Texass', CODES) is None
+    assert to_state_code('', CODES) is None
@@ -0,0 +1,36 @@
+import os
+import sys
+
+from werkzeug.test import Client
+from werkzeug.wrappers import Response
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from profiling import ProfilingMiddleware, make_token, is_profiled  # noqa: E402
+
+SECRET_KEY = 'test-secret'
+
+
+def page(environ, start_response):
+    response = Response(f'profiled={is_profiled(environ)}')
+    response.cache_control.public = True
+    response.cache_control.max_age = 300
+    return response(environ, start_response)
+
+
+def test_profiled_responses_are_not_stored(tmp_path):
+    client = Client(ProfilingMiddleware(page, SECRET_KEY, str(tmp_path)))
+    response = client.get('/city/portland-or', headers={'X-Profile-Token': make_token(SECRET_KEY)})
+    assert response.get_data(as_text=True) == 'profiled=True'
+    assert response.headers.getlist('Cache-Control') == ['no-store']
+    assert 'X-Profile-Id' in response.headers
+    assert os.listdir(tmp_path)
+
+
+def test_unprofiled_responses_keep_their_cache_headers(tmp_path):
+    client = Client(ProfilingMiddleware(page, SECRET_KEY, str(tmp_path)))
+    for headers in ({}, {'X-Profile-Token': 'forged'}):
+        response = client.get('/city/portland-or', headers=headers)
+        assert response.get_data(as_text=True) == 'profiled=False'
+        assert response.headers['Cache-Control'] == 'public, max-age=300'
+        assert 'X-Profile-Id' not in response.headers
@@ -0,0 +1,33 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ranking import bayesian_score  # noqa: E402
+
+
+@pytest.mark.parametrize('rating, reviews_count, per_score', [
+    (None, None, None),
+    (5.0, 0, None),
+    (None, None, [0, 0, 0, 0, 0]),
+    (None, None, [None] * 5),
+])
+def test_no_reviews_scores_the_prior(rating, reviews_count, per_score):
+    assert bayesian_score(rating, reviews_count, per_score, prior_mean=3.5, prior_weight=10) == 3.5
+
+
+def test_many_reviews_approach_the_rating():
+    assert bayesian_score(4.8, 100000, prior_mean=4.0, prior_weight=10) == pytest.approx(4.8, abs=1e-3)
+    assert bayesian_score(None, None, [0, 0, 0, 0, 100000]) == pytest.approx(5.0, abs=1e-3)
+
+
+def test_a_few_perfect_reviews_rank_below_many_good_ones():
+    assert bayesian_score(5.0, 1) < bayesian_score(4.6, 500)
+    assert bayesian_score(5.0, 1) == pytest.approx((10 * 4.0 + 5.0) / 11)
+
+
+def test_histogram_takes_precedence_over_rating():
+    # One 1-star and three 5-star reviews: a total of 16 stars
+    assert bayesian_score(4.9, 200, [1, 0, 0, 0, 3], prior_mean=4.0, prior_weight=10) == pytest.approx(56 / 14)
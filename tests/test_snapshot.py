@@ -0,0 +1,90 @@
+import os
+import csv
+import sys
+import uuid
+from datetime import datetime, timezone
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from snapshot import (SnapshotWriter, open_snapshot, read_snapshot, snapshot_row, location_row,  # noqa: E402
+                      state_slices, batch_csv, SCHEMA, SUBTYPES_SEPARATOR)
+
+METADATA = {'type': 'Golf club', 'subtypes': ['Golf club', 'Indoor golf course'], 'photos_count': 12,
+            'place_id': 'place-1', 'google_id': 'gid-1', 'last_synced': '2026-01-02T03:04:05'}
+
+
+def locations_row(**overrides):
+    row = {
+        'id': uuid.uuid4(), 'business_name': 'Swing Lab', 'address': '1 Main St, Portland, OR 97201',
+        'city': 'Portland', 'state': 'OR', 'zip_code': '97201', 'phone': '555-0100', 'website': None,
+        'description': None, 'hours': None, 'slug': 'swing-lab',
+        'created_at': datetime(2026, 1, 1, tzinfo=timezone.utc), 'updated_at': datetime(2026, 1, 2, tzinfo=timezone.utc),
+        'rating': 4.5, 'reviews_count': 20, 'reviews_link': None, 'reviews_per_score_1': 1,
+        'reviews_per_score_2': 0, 'reviews_per_score_3': 2, 'reviews_per_score_4': 5,
+        'reviews_per_score_5': 12, 'score': 4.31, 'location': '(45.5231,-122.6765)',
+        'latitude': 45.5231, 'longitude': -122.6765, 'location_metadata': METADATA,
+    }
+    row.update(overrides)
+    return row
+
+
+HOURS = [
+    {'Monday': ['9AM-5PM'], 'Tuesday': '9AM-5PM', 'Sunday': 'Closed'},
+    'Mon-Fri 9-5',
+    [['Monday', '9AM-5PM'], ['Tuesday', None]],
+    None,
+]
+
+
+@pytest.mark.parametrize('hours', HOURS)
+def test_hours_round_trip(hours):
+    assert location_row(snapshot_row(locations_row(hours=hours)))['hours'] == hours
+
+
+def test_columns_coordinates_and_metadata_round_trip():
+    row = locations_row()
+    restored = location_row(snapshot_row(row))
+    assert restored['location'] == row['location']
+    assert restored['location_metadata'] == METADATA
+    for column in ('id', 'business_name', 'state', 'slug', 'created_at', 'rating', 'score', 'reviews_per_score_5'):
+        assert restored[column] == row[column]
+
+
+def test_missing_coordinates_and_metadata():
+    restored = location_row(snapshot_row(locations_row(location=None, latitude=None, longitude=None,
+                                                       location_metadata=None)))
+    assert restored['location'] is None
+    assert restored['location_metadata']['subtypes'] == []
+    assert restored['location_metadata']['place_id'] is None
+
+
+@pytest.mark.parametrize('suffix', ['parquet', 'arrow'])
+def test_file_round_trip(tmp_path, suffix):
+    rows = [locations_row(hours=hours) for hours in HOURS]
+    path = str(tmp_path / f'locations.{suffix}')
+    with SnapshotWriter(path, states=[('OR', 'Oregon', 'US')], format=suffix) as writer:
+        writer.write([snapshot_row(row) for row in rows])
+
+    states, batches = read_snapshot(path)
+    records = [record for batch in batches for record in batch]
+    assert states == [('OR', 'Oregon', 'US')]
+    assert [location_row(record)['hours'] for record in records] == HOURS
+    assert [location_row(record)['location_metadata'] for record in records] == [METADATA] * len(HOURS)
+
+
+def test_batches_are_sliced_by_state_and_encoded_for_copy(tmp_path):
+    rows = [locations_row(state=state, hours=hours) for state, hours in zip(['OR', 'OR', 'WA', 'WA'], HOURS)]
+    path = str(tmp_path / 'locations.parquet')
+    with SnapshotWriter(path) as writer:
+        writer.write([snapshot_row(row) for row in rows])
+
+    _, batches = open_snapshot(path)
+    slices = [(state, rows) for batch in batches for state, rows in state_slices(batch)]
+    assert [(state, rows.num_rows) for state, rows in slices] == [('OR', 2), ('WA', 2)]
+
+    lines = list(csv.reader(batch_csv(slices[0][1]).read().decode().splitlines()))
+    assert len(lines) == 2 and len(lines[0]) == len(SCHEMA)
+    assert lines[0][SCHEMA.names.index('subtypes')] == SUBTYPES_SEPARATOR.join(METADATA['subtypes'])
+    assert lines[1][SCHEMA.names.index('hours')] == '"Mon-Fri 9-5"'
@@ -0,0 +1,82 @@
+import os
+import sys
+import threading
+import time
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from suggest import fold, SuggestIndex, RefreshingSuggestIndex  # noqa: E402
+
+
+@pytest.mark.parametrize('text, folded', [
+    ("Bogey's Café", 'bogeys cafe'),
+    ('  SWING-Lab   Portland ', 'swing lab portland'),
+    ('Zürich Golf St. Gallen', 'zurich golf st gallen'),
+    ("'.", ''),
+])
+def test_fold(text, folded):
+    assert fold(text) == folded
+
+
+def entries(count=600):
+    labels = [(f'Golf {i:04d}', i) for i in range(count)]
+    labels += [('Gold Coast Golf', 10000), ('Swing Lab', 5), ('Swing Lounge', 50), ('Café Swing', 1000)]
+    return [(label, score, {'label': label}) for label, score in labels]
+
+
+def brute_force(entries, query, limit):
+    prefix = fold(query)
+    matches = [(score, payload) for label, score, payload in entries if fold(label).startswith(prefix)]
+    return [payload for _, payload in sorted(matches, key=lambda match: -match[0])[:limit]]
+
+
+@pytest.mark.parametrize('query', ['g', 'go', 'gol', 'golf', 'golf 01', 'golf 0599', 'sw', 'swing l', 'cafe', 'xyz'])
+def test_prefix_matches_are_ranked_by_score(query):
+    data = entries()
+    index = SuggestIndex(data, block_size=16)
+    assert index.search(query, 8) == brute_force(data, query, 8)
+
+
+def test_prefix_is_matched_after_folding():
+    index = SuggestIndex(entries())
+    assert index.search('CAFÉ s') == [{'label': 'Café Swing'}]
+
+
+def test_limit_is_capped_at_max_results():
+    index = SuggestIndex(entries(), max_results=5, block_size=16)
+    assert len(index.search('golf', limit=3)) == 3
+    assert len(index.search('golf', limit=50)) == 5
+    assert index.search('') == []
+    assert index.search('!!') == []
+
+
+def test_cold_search_returns_nothing_and_builds_in_background():
+    built = threading.Event()
+
+    def load_entries():
+        built.wait(5)
+        return entries(10)
+
+    index = RefreshingSuggestIndex(load_entries, lambda: 1)
+    assert index.search('swing') == []
+    built.set()
+    for _ in range(100):
+        if index.search('swing'):
+            break
+        time.sleep(0.05)
+    assert index.search('swing') == [{'label': 'Swing Lounge'}, {'label': 'Swing Lab'}]
+
+
+def test_warm_rebuilds_when_the_version_changes():
+    version = [1]
+    data = [entries(5)]
+    index = RefreshingSuggestIndex(lambda: data[0], lambda: version[0], refresh_seconds=0)
+    index.warm()
+    assert index.search('swing l', 1) == [{'label': 'Swing Lounge'}]
+
+    data[0] = [('Swing Loft', 1, {'label': 'Swing Loft'})]
+    version[0] = 2
+    index._refresh_if_changed()
+    assert index.search('swing l') == [{'label': 'Swing Loft'}]